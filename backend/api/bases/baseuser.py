@@ -8,13 +8,15 @@ from __future__ import annotations
 from enum import Enum
 from typing import Optional, List, TYPE_CHECKING
 
+import trio
+
 from ..utilities.url import URLGenerator
 
 from .baseitem import BaseItem
 from ..bases.basebadge import BaseBadge
 from ..instances import ItemInstance, InstanceType, AssetInstance, GamePassInstance, instance_classes
 from ..partials.partialbadge import PartialBadge
-from ..presence import Presence
+from ..presence import Presence, PresenceType
 from ..promotionchannels import UserPromotionChannels
 from ..robloxbadges import RobloxBadge
 from ..utilities.iterators import PageIterator, CursoredPageIterator, SortOrder
@@ -28,6 +30,24 @@ if TYPE_CHECKING:
     from ..utilities.types import AssetOrAssetId, GamePassOrGamePassId, GroupOrGroupId
 
 
+MAX_PROFILE_BATCH_SIZE = 200
+
+
+def friend_sort_score(presence: Presence) -> float:
+    """
+    Returns the score friends are sorted by: in game first, then in studio, online and offline.
+    """
+    # 2=InGame, 3=Studio, 1=Online, 0=Offline
+    ptype = presence.user_presence_type.value
+    if ptype == 2:
+        return 30
+    elif ptype == 3:
+        return 20
+    elif ptype == 1:
+        return 10
+    return 0
+
+
 class UserSort(Enum):
     friend_score = "FriendScore"
     friendship_created_date = "CreatedDate"
@@ -124,6 +144,8 @@ class BaseUser(BaseItem):
         )
 
     class Friends:
+        __slots__ = ("id", "name", "displayName", "presence", "sortScore")
+
         def __init__(self, data):
             self.id: int = data["id"]
             self.name: str = data["name"]
@@ -136,78 +158,76 @@ class BaseUser(BaseItem):
         Grabs the user's friends using the v2 endpoint.
 
         Returns:
-            A CursoredPageIterator of the user's friends.
+            A list of the user's friends, with names and presence, sorted by presence.
         """
 
         response = await self._client.requests.get(
             url=self._client._url_generator_roproxy.get_url(
                 "friends", f"v1/users/{self.id}/friends"),
         )
-        friends_data = response.json()["data"]
+        return await self.hydrate_friends(response.json()["data"])
 
-        usernames_response = await self._client.requests.post(
-            url=self._client._url_generator_roproxy.get_url(
-                "apis", f"user-profile-api/v1/user/profiles/get-profiles"),
-            json={"userIds": [friends_data[i]["id"]
-                              for i in range(len(friends_data))], "fields": ["names.combinedName", "names.username"]}
-        )
-        usernames_data = usernames_response.json()["profileDetails"]
-        username_map = {user["userId"]: user for user in usernames_data}
-        for friend in friends_data:
-            friend_id = friend["id"]
-            if friend_id in username_map:
-                friend["name"] = username_map[friend_id]["names"]["username"]
-                friend["displayName"] = username_map[friend_id]["names"]["combinedName"]
-            else:
-                friend["name"] = ""
-                friend["displayName"] = ""
-
-        # Fetch presences using the public presence endpoint
+    async def hydrate_friends(self, friends_data: List[dict]):
+        """
+        Adds names and presence to a list of friend entries and sorts them by presence.
+        Names and presences only depend on the IDs, so every chunk of both is requested concurrently.
+
+        Arguments:
+            friends_data: A list of dictionaries containing at least the friend's "id".
+
+        Returns:
+            A list of Friends.
+        """
         friend_ids = [friend["id"] for friend in friends_data]
-        presences = await self._client.presence.get_user_presences(friend_ids)
-        presence_map = {p.user.id: p for p in presences}
-
-        # Add presence information to friends data
-        for friend in friends_data:
-            friend_id = friend["id"]
-            if friend_id in presence_map:
-                friend["presence"] = presence_map[friend_id]
-
-                # Calculate sort score manually
-                ptype = friend["presence"].user_presence_type.value
-                # 2=InGame, 3=Studio, 1=Online, 0=Offline
-                if ptype == 2:
-                    score = 30
-                elif ptype == 3:
-                    score = 20
-                elif ptype == 1:
-                    score = 10
-                else:
-                    score = 0
-                friend["sortScore"] = score
-            else:
-                friend["presence"] = Presence(
+        if not friend_ids:
+            return []
+
+        username_map = {}
+        presence_map = {}
+
+        async def fetch_profiles(user_ids: List[int]):
+            usernames_response = await self._client.requests.post(
+                url=self._client._url_generator_roproxy.get_url(
+                    "apis", f"user-profile-api/v1/user/profiles/get-profiles"),
+                json={"userIds": user_ids, "fields": ["names.combinedName", "names.username"]}
+            )
+            for user in usernames_response.json()["profileDetails"]:
+                username_map[user["userId"]] = user["names"]
+
+        async def fetch_presences():
+            # Fetch presences using the public presence endpoint
+            for presence in await self._client.presence.get_user_presences(friend_ids):
+                presence_map[presence.user.id] = presence
+
+        async with trio.open_nursery() as nursery:
+            for start in range(0, len(friend_ids), MAX_PROFILE_BATCH_SIZE):
+                nursery.start_soon(fetch_profiles, friend_ids[start:start + MAX_PROFILE_BATCH_SIZE])
+            nursery.start_soon(fetch_presences)
+
+        result = []
+        for friend_id in friend_ids:
+            names = username_map.get(friend_id)
+            presence = presence_map.get(friend_id)
+            result.append(self.Friends({
+                "id": friend_id,
+                "name": names["username"] if names else "",
+                "displayName": names["combinedName"] if names else "",
+                "presence": presence or Presence(
                     self._client, {
                         "userId": friend_id,
-                        "userPresenceType": 0,
+                        "userPresenceType": PresenceType.offline.value,
                         "lastLocation": None,
                         "placeId": None,
                         "rootPlaceId": None,
                         "gameId": None,
                         "universeId": None,
-                    })
-                # Lowest score for offline users
-                friend["sortScore"] = float('-inf')
+                    }),
+                # Lowest score for users without a presence
+                "sortScore": friend_sort_score(presence) if presence else float('-inf'),
+            }))
 
         # Sort friends by sortScore in descending order
-        friends_data.sort(key=lambda x: x["sortScore"], reverse=True)
-
-        # Add type information to each friend
-        result = [
-            self.Friends(friend)
-            for friend in friends_data
-        ]
-
+        result.sort(key=lambda friend: friend.sortScore, reverse=True)
         return result
 
     async def get_currency(self) -> int:
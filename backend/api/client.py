@@ -99,6 +99,8 @@ class Client:
                 url=f"wss://{self._ws_url}", token=token)
 
         self._requests.session.cookies[".ROBLOSECURITY"] = token
+        # presences visible to one account are not necessarily visible to another
+        self.presence.invalidate()
 
     def set_base_url(self, base_url: str) -> None:
         """
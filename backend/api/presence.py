@@ -6,11 +6,14 @@ This module contains classes intended to parse and deal with data from Roblox pr
 
 from __future__ import annotations
 
+import threading
+import time
 from datetime import datetime
 from enum import IntEnum
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Tuple, Callable
 from typing import TYPE_CHECKING
 
+import trio
 from dateutil.parser import parse
 
 from .bases.basejob import BaseJob
@@ -23,6 +26,9 @@ if TYPE_CHECKING:
     from .utilities.types import UserOrUserId
 
 
+MAX_PRESENCE_BATCH_SIZE = 50
+
+
 class PresenceType(IntEnum):
     """
     Represents a user's presence type.
@@ -87,32 +93,153 @@ class PresenceProvider:
     """
     The PresenceProvider is an object that represents https://presence.roblox.com/ and provides multiple functions
     for fetching user presence information.
+
+    Fetched presences are kept in an in-memory table keyed by user ID. Lookups only request users whose entry is
+    missing or older than the freshness bound. While the realtime connection is up, changed users are invalidated
+    by PresenceBulkNotifications, so entries stay valid for the longer `connected_max_age`.
+
+    Attributes:
+        max_age: How many seconds a stored presence stays fresh without a realtime connection.
+        connected_max_age: How many seconds a stored presence stays fresh while the realtime connection is up.
     """
 
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, max_age: float = 30.0, connected_max_age: float = 300.0):
         self._client: Client = client
+        self.max_age: float = max_age
+        self.connected_max_age: float = connected_max_age
+
+        self._store: Dict[int, Tuple[float, Presence]] = {}
+        # presences are read from the js_api threads and invalidated from the realtime thread
+        self._store_lock: threading.Lock = threading.Lock()
+        self._listeners: List[Callable[[List[Presence]], None]] = []
+
+    def _is_fresh(self, stored_at: float, now: float, max_age: Optional[float]) -> bool:
+        if max_age is not None:
+            return now - stored_at <= max_age
+        websocket = self._client.websocket
+        # changes are only pushed while connected, so entries stored before the current connection opened
+        # may have missed notifications
+        if websocket and websocket.connected and stored_at >= websocket.connected_at:
+            return now - stored_at <= self.connected_max_age
+        return now - stored_at <= self.max_age
+
+    def get_cached_presences(self, users: Iterable[UserOrUserId], max_age: Optional[float] = None) -> Dict[int, Presence]:
+        """
+        Returns the stored presences of the passed users that are still fresh, without sending any requests.
+
+        Arguments:
+            users: The users to look up.
+            max_age: How many seconds old a presence may be. Defaults to the provider's freshness bounds.
+
+        Returns:
+            A dictionary of user IDs to Presences.
+        """
+        now = time.monotonic()
+
+        presences = {}
+        with self._store_lock:
+            for user_id in map(int, users):
+                entry = self._store.get(user_id)
+                if entry and self._is_fresh(entry[0], now, max_age):
+                    presences[user_id] = entry[1]
+        return presences
+
+    def add_listener(self, listener: Callable[[List[Presence]], None]):
+        """
+        Registers a callable that receives every batch of presences fetched from the presence endpoint,
+        so indices built on presence can be updated with only what changed.
+
+        Arguments:
+            listener: The callable to register.
+        """
+        self._listeners.append(listener)
 
-    async def get_user_presences(self, users: List[UserOrUserId]) -> List[Presence]:
+    def update_presences(self, presences: Iterable[Presence]):
+        """
+        Stores the passed presences as fresh.
+
+        Arguments:
+            presences: The presences to store.
+        """
+        presences = list(presences)
+        now = time.monotonic()
+        with self._store_lock:
+            for presence in presences:
+                self._store[presence.user.id] = (now, presence)
+        for listener in self._listeners:
+            try:
+                listener(presences)
+            except Exception as e:
+                print(f"Error in presence listener: {e}", flush=True)
+
+    def invalidate(self, users: Optional[Iterable[UserOrUserId]] = None):
+        """
+        Marks the stored presences of the passed users as stale, so the next lookup requests them again.
+
+        Arguments:
+            users: The users to invalidate. If not passed, every stored presence is dropped.
+        """
+        with self._store_lock:
+            if users is None:
+                self._store.clear()
+                return
+            for user_id in map(int, users):
+                self._store.pop(user_id, None)
+
+    def snapshot(self) -> Dict[int, Tuple[float, Presence]]:
+        """
+        Returns a copy of the stored presences, keyed by user ID, with the time each one was stored.
+        """
+        with self._store_lock:
+            return dict(self._store)
+
+    def restore(self, entries: Dict[int, Tuple[float, Presence]]):
+        """
+        Adds presences taken with `snapshot` to the store, keeping their original store times.
+
+        Arguments:
+            entries: The entries to add.
+        """
+        with self._store_lock:
+            self._store.update(entries)
+
+    async def get_user_presences(self, users: List[UserOrUserId], max_age: Optional[float] = None) -> List[Presence]:
         """
         Grabs a list of Presence objects corresponding to each user in the list.
+        Fresh stored presences are reused, only the remaining users are requested, in concurrent batches.
 
         Arguments:
             users: The list of users you want to get Presences from.
+            max_age: How many seconds old a stored presence may be. Pass 0 to always request every user.
 
         Returns:
             A list of Presences.
         """
-
-        presences_response = await self._client.requests.post(
-            url=self._client.url_generator.get_url(
-                "presence", "v1/presence/users"),
-            json={
-                "userIds": list(map(int, users))
-            }
-        )
-        try:
-            presences_data = presences_response.json().get("userPresences", [])
-        except ValueError:
-            raise ValueError(
-                "Invalid JSON response received from the presence endpoint.")
-        return [Presence(client=self._client, data=presence_data) for presence_data in presences_data]
+        user_ids = list(map(int, users))
+        presences = self.get_cached_presences(user_ids, max_age)
+        missing_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in presences]
+
+        async def fetch(batch_ids: List[int]):
+            presences_response = await self._client.requests.post(
+                url=self._client.url_generator.get_url(
+                    "presence", "v1/presence/users"),
+                json={
+                    "userIds": batch_ids
+                }
+            )
+            try:
+                presences_data = presences_response.json().get("userPresences", [])
+            except ValueError:
+                raise ValueError(
+                    "Invalid JSON response received from the presence endpoint.")
+            fetched = [Presence(client=self._client, data=presence_data) for presence_data in presences_data]
+            self.update_presences(fetched)
+            for presence in fetched:
+                presences[presence.user.id] = presence
+
+        if missing_ids:
+            async with trio.open_nursery() as nursery:
+                for start in range(0, len(missing_ids), MAX_PRESENCE_BATCH_SIZE):
+                    nursery.start_soon(fetch, missing_ids[start:start + MAX_PRESENCE_BATCH_SIZE])
+
+        return [presences[user_id] for user_id in dict.fromkeys(user_ids) if user_id in presences]
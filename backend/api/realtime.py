@@ -1,14 +1,73 @@
 from signalrcore import hub_connection_builder
+from collections import deque
 import json
+import random
+import threading
+import time
 
 
 class WebSocketBuilder:
-    def __init__(self, url: str, token: str):
+    """
+    Keeps a SignalR connection to the realtime hub alive.
+
+    Connections are opened by a supervisor thread, never by the caller or by signalrcore callbacks. After a
+    disconnect the supervisor waits with exponential backoff and jitter before reconnecting, and never makes
+    more than `max_attempts_per_minute` attempts in a rolling minute. Backoff only resets once a connection
+    has stayed up for `stable_after` seconds, so a flapping network does not cause a reconnect storm.
+
+    Attributes:
+        state: One of "connecting", "connected", "waiting" or "stopped".
+        connected: Whether the connection is currently open.
+        connected_at: The monotonic time at which the current connection opened.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            token: str,
+            base_delay: float = 1.0,
+            max_delay: float = 60.0,
+            max_attempts_per_minute: int = 6,
+            stable_after: float = 30.0,
+            connect: bool = True
+    ):
         self.url = url
         self.token = token
         self._event_handlers = {}
         self.hub_connection = None
-        self._start()
+        self.connected = False
+        self.connected_at = 0.0
+
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts_per_minute = max_attempts_per_minute
+        self.stable_after = stable_after
+
+        self.state = "connecting" if connect else "stopped"
+        self.failures = 0
+        self.attempts = 0
+        self.reconnects = 0
+        self.uptime = 0.0
+        self.messages = 0
+        self.last_error = None
+        # only the last max_attempts_per_minute attempts matter for the cap
+        self._attempt_times: deque[float] = deque(maxlen=max_attempts_per_minute)
+        self._message_times: deque[float] = deque()
+
+        # bumped for every new connection so callbacks from replaced connections are ignored
+        self._generation = 0
+        self._wake = threading.Event()
+        self._immediate = True
+        self._lock = threading.Lock()
+
+        self._recording = None
+        self._recording_started_at = 0.0
+
+        # without connecting, notifications can still be fed to `_on_notification`, e.g. when replaying a recording
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        if connect:
+            self._supervisor.start()
+            self._wake.set()
 
     def _build_connection(self, url: str, token: str):
         return hub_connection_builder.HubConnectionBuilder()\
@@ -22,29 +81,168 @@ class WebSocketBuilder:
             }
         ).build()
 
-    def _start(self):
-        if self.hub_connection:
+    def _on_open(self, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.connected_at = time.monotonic()
+            self.connected = True
+            self.state = "connected"
+        print("Connection opened", flush=True)
+
+    def _on_disconnect(self, generation: int, error=None):
+        with self._lock:
+            # on_error and on_close can both fire for the same connection
+            if generation != self._generation or self.state in ("stopped", "waiting"):
+                return
+            if self.connected:
+                connection_uptime = time.monotonic() - self.connected_at
+                self.uptime += connection_uptime
+                if connection_uptime >= self.stable_after:
+                    self.failures = 0
+            self.connected = False
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            self.state = "waiting"
+        self._wake.set()
+
+    def _next_delay(self) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** max(self.failures - 1, 0))
+        # full jitter keeps clients that dropped together from reconnecting together
+        delay = random.uniform(delay / 2, delay)
+
+        now = time.monotonic()
+        if len(self._attempt_times) == self.max_attempts_per_minute:
+            delay = max(delay, self._attempt_times[0] + 60 - now)
+        return delay
+
+    def _supervise(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+
+            with self._lock:
+                if self.state == "stopped":
+                    return
+                immediate, self._immediate = self._immediate, False
+            if not immediate:
+                # a token swap during the wait wakes us up and connects right away
+                if self._wake.wait(self._next_delay()):
+                    continue
+            self._connect()
+
+    def _connect(self):
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            old_connection = self.hub_connection
+            if self.connected:
+                self.uptime += time.monotonic() - self.connected_at
+            self.connected = False
+            self.state = "connecting"
+            if self.attempts:
+                self.reconnects += 1
+            self.attempts += 1
+            self._attempt_times.append(time.monotonic())
+
+        if old_connection:
             try:
-                self.hub_connection.stop()
+                old_connection.stop()
             except:
                 pass
 
-        self.hub_connection = self._build_connection(self.url, self.token)
-        self.hub_connection.on_open(
-            lambda: print("Connection opened", flush=True))
-        self.hub_connection.on("notification", self._on_notification)
-        self.hub_connection.on("subscriptionStatus",
-                               self._on_subscription_status)
-        self.hub_connection.on_error(self._start)
-        self.hub_connection.on_close(self._start)
-        self.hub_connection.start()
+        try:
+            hub_connection = self._build_connection(self.url, self.token)
+            hub_connection.on_open(lambda: self._on_open(generation))
+            hub_connection.on("notification", self._on_notification)
+            hub_connection.on("subscriptionStatus",
+                              self._on_subscription_status)
+            hub_connection.on_error(lambda error=None: self._on_disconnect(generation, error))
+            hub_connection.on_close(lambda: self._on_disconnect(generation))
+            self.hub_connection = hub_connection
+            hub_connection.start()
+        except Exception as e:
+            self._on_disconnect(generation, e)
 
     def set_token(self, new_token: str):
-        self.token = new_token
-        self._start()
+        """
+        Switches the connection to another account. Returns immediately, the reconnect happens on the
+        supervisor thread without backoff.
+        """
+        with self._lock:
+            self.token = new_token
+            self.failures = 0
+            self._immediate = True
+            if self.state != "stopped":
+                self.state = "connecting"
+        self._wake.set()
+
+    def stop(self):
+        """
+        Closes the connection and stops reconnecting.
+        """
+        with self._lock:
+            self.state = "stopped"
+            if self.connected:
+                self.uptime += time.monotonic() - self.connected_at
+            self.connected = False
+            self._generation += 1
+            hub_connection = self.hub_connection
+        self._wake.set()
+        if hub_connection:
+            try:
+                hub_connection.stop()
+            except:
+                pass
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            while self._message_times and now - self._message_times[0] >= 60:
+                self._message_times.popleft()
+            current_uptime = now - self.connected_at if self.connected else 0.0
+            return {
+                "state": self.state,
+                "connected": self.connected,
+                "attempts": self.attempts,
+                "reconnects": self.reconnects,
+                "failures": self.failures,
+                "currentUptime": current_uptime,
+                "totalUptime": self.uptime + current_uptime,
+                "messages": self.messages,
+                "messagesPerMinute": len(self._message_times),
+                "lastError": self.last_error,
+            }
+
+    def start_recording(self, path: str):
+        """
+        Starts appending every raw notification to the passed file, one JSON line per notification holding
+        the seconds since recording started and the raw `[type, payload, sequence]` list.
+        """
+        with self._lock:
+            if self._recording:
+                self._recording.close()
+            self._recording = open(path, "a", encoding="utf-8")
+            self._recording_started_at = time.monotonic()
+
+    def stop_recording(self):
+        with self._lock:
+            if self._recording:
+                self._recording.close()
+                self._recording = None
 
     def _on_notification(self, data):
         print(f"Notification received: {json.dumps(data)}", flush=True)
+        with self._lock:
+            now = time.monotonic()
+            self.messages += 1
+            self._message_times.append(now)
+            while now - self._message_times[0] >= 60:
+                self._message_times.popleft()
+            if self._recording:
+                self._recording.write(json.dumps(
+                    {"t": now - self._recording_started_at, "data": data}) + "\n")
+                self._recording.flush()
 
         # Data format: [notification_type, json_payload, sequence]
         if isinstance(data, list) and len(data) >= 2:
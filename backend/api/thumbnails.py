@@ -630,12 +630,14 @@ class ThumbnailProvider:
             size: SizeTupleOrString = (48, 48),
             image_format: ThumbnailFormat = ThumbnailFormat.png,
             is_circular: bool = False,
+            batch_size: int = 50,
     ) -> Thumbnail:
         """
         Returns the user's avatar thumbnail using an avatar token.
 
         Arguments:
             token: Avatar token.
+            batch_size: How many tokens to send per v1/batch request (the endpoint accepts up to 100).
 
         Returns:
             A Thumbnail.
@@ -662,4 +664,4 @@ class ThumbnailProvider:
                           for td in thumbnail_data]
             return thumbnails
 
-        return await self._process_in_batches(tokens, 50, process_batch)
+        return await self._process_in_batches(tokens, batch_size, process_batch)
@@ -0,0 +1,230 @@
+"""
+
+This module contains the exporter used to stream iterator data to disk.
+
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from .iterators import RobloxIterator
+
+
+def item_to_row(item) -> dict:
+    """
+    Converts an iterator item into a flat, JSON-serializable row.
+    Public attributes are kept, nested Roblox objects are reduced to their ID.
+
+    Arguments:
+        item: The item to convert.
+
+    Returns:
+        A dictionary.
+    """
+    if isinstance(item, dict):
+        return item
+
+    row = {}
+    for key, value in vars(item).items():
+        if key.startswith("_"):
+            continue
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            row[key] = value
+        elif isinstance(value, datetime):
+            row[key] = value.isoformat()
+        elif isinstance(value, Enum):
+            row[key] = value.name
+        elif hasattr(value, "id"):
+            row[f"{key}_id"] = value.id
+    return row
+
+
+class ExportProgress:
+    """
+    Represents the progress of an export.
+
+    Attributes:
+        rows: How many rows have been written, including rows from earlier interrupted runs.
+        pages: How many pages were written during this run.
+        elapsed: How many seconds this run has taken so far.
+        cursor: The cursor of the next page to export, or None once the export is complete.
+        complete: Whether every page has been exported.
+    """
+
+    def __init__(self, rows: int = 0):
+        self.rows: int = rows
+        self.pages: int = 0
+        self.elapsed: float = 0.0
+        self.cursor = None
+        self.complete: bool = False
+        self._run_rows: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        How many rows per second this run has written.
+        """
+        return self._run_rows / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} rows={self.rows} pages={self.pages} complete={self.complete}>"
+
+
+class IteratorExporter:
+    """
+    Streams every page of an iterator to an NDJSON or CSV file as the pages arrive, keeping memory use
+    constant regardless of how many rows are exported.
+
+    After each page is written, the cursor of the following page is saved to a checkpoint file together
+    with the file size. Running the same export again resumes from that cursor after truncating anything
+    written past the last checkpoint.
+
+    Attributes:
+        iterator: The iterator to export.
+        path: The file to write rows to.
+        format: Either "ndjson" or "csv".
+        checkpoint_path: Where the resume checkpoint is stored.
+        row_handler: A callable converting an item into a row dictionary.
+        progress_handler: A callable receiving an ExportProgress after each page.
+        read_ahead: How many pages to fetch while earlier pages are being written.
+    """
+
+    def __init__(
+            self,
+            iterator: RobloxIterator,
+            path: Union[str, Path],
+            format: str = "ndjson",
+            checkpoint_path: Optional[Union[str, Path]] = None,
+            row_handler: Callable[[object], dict] = item_to_row,
+            progress_handler: Optional[Callable[[ExportProgress], None]] = None,
+            read_ahead: int = 1
+    ):
+        """
+        Arguments:
+            iterator: The iterator to export. It should not have been advanced yet.
+            path: The file to write rows to.
+            format: Either "ndjson" or "csv".
+            checkpoint_path: Where the resume checkpoint is stored. Defaults to the export path with a ".checkpoint" suffix.
+            row_handler: A callable converting an item into a row dictionary.
+            progress_handler: A callable receiving an ExportProgress after each page.
+            read_ahead: How many pages to fetch while earlier pages are being written.
+        """
+        if format not in ("ndjson", "csv"):
+            raise ValueError("Export format must be either 'ndjson' or 'csv'.")
+
+        self.iterator: RobloxIterator = iterator
+        self.path: Path = Path(path)
+        self.format: str = format
+        self.checkpoint_path: Path = Path(checkpoint_path) if checkpoint_path else \
+            self.path.with_name(self.path.name + ".checkpoint")
+        self.row_handler: Callable[[object], dict] = row_handler
+        self.progress_handler: Optional[Callable[[ExportProgress], None]] = progress_handler
+        self.read_ahead: int = read_ahead
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self, checkpoint: dict):
+        temp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def export(self) -> ExportProgress:
+        """
+        Runs (or resumes) the export.
+
+        Returns:
+            The final ExportProgress.
+        """
+        checkpoint = self._load_checkpoint()
+        progress = ExportProgress(rows=checkpoint["rows"] if checkpoint else 0)
+        fieldnames: Optional[list] = checkpoint.get("fieldnames") if checkpoint else None
+
+        if checkpoint:
+            if checkpoint["cursor"] is None:
+                progress.complete = True
+                return progress
+            # resume right after the last page that was fully written
+            self.iterator.page_cursors = [checkpoint["cursor"]]
+            self.iterator.seek(0)
+
+        started_at = time.monotonic()
+        with open(self.path, "a+b" if checkpoint else "wb") as raw_file:
+            if checkpoint:
+                raw_file.truncate(checkpoint["size"])
+                raw_file.seek(checkpoint["size"])
+
+            # the producer may already be pages ahead, so the cursor is looked up by the consumed page's index
+            page_index = self.iterator.page_index
+            async with self.iterator.stream_pages(self.read_ahead) as pages:
+                async for page in pages:
+                    page_index += 1
+                    rows = [self.row_handler(item) for item in page]
+                    lines = []
+                    if self.format == "ndjson":
+                        lines = [json.dumps(row, default=str) + "\n" for row in rows]
+                    elif rows:
+                        lines_buffer = _LineBuffer()
+                        if fieldnames is None:
+                            fieldnames = list(rows[0].keys())
+                            writer = csv.DictWriter(lines_buffer, fieldnames=fieldnames, extrasaction="ignore")
+                            writer.writeheader()
+                        else:
+                            writer = csv.DictWriter(lines_buffer, fieldnames=fieldnames, extrasaction="ignore")
+                        writer.writerows(rows)
+                        lines = lines_buffer.lines
+
+                    raw_file.write("".join(lines).encode("utf-8"))
+                    raw_file.flush()
+
+                    progress.rows += len(rows)
+                    progress._run_rows += len(rows)
+                    progress.pages += 1
+                    progress.elapsed = time.monotonic() - started_at
+                    progress.cursor = self.iterator.page_cursors[page_index + 1]
+
+                    self._save_checkpoint({
+                        "cursor": progress.cursor,
+                        "rows": progress.rows,
+                        "size": raw_file.tell(),
+                        "fieldnames": fieldnames,
+                    })
+
+                    if self.progress_handler:
+                        self.progress_handler(progress)
+
+        progress.elapsed = time.monotonic() - started_at
+        progress.cursor = None
+        progress.complete = True
+        self._save_checkpoint({
+            "cursor": None,
+            "rows": progress.rows,
+            "size": self.path.stat().st_size,
+            "fieldnames": fieldnames,
+        })
+        return progress
+
+
+class _LineBuffer:
+    """
+    A minimal file-like object collecting the lines written by csv.writer.
+    """
+
+    def __init__(self):
+        self.lines: list = []
+
+    def write(self, line: str):
+        self.lines.append(line)
@@ -10,9 +10,14 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from ..client import Client
 
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from enum import Enum
 from typing import Callable, Optional, AsyncIterator, Any
 
+import trio
+
 from .exceptions import NoMoreItems
 
 
@@ -93,10 +98,139 @@ class IteratorPages(AsyncIterator):
 class RobloxIterator:
     """
     Represents a basic iterator which all iterators should implement.
+
+    Every iterator records the cursor that fetches each page index it visits, so pages that were already
+    visited can be fetched again directly (see `get_page_at`) and the iterator can be restarted without
+    walking the cursor chain again. Visited pages can also be kept in an optional bounded page cache.
+
+    Attributes:
+        max_items: The maximum amount of items to return when this iterator is looped through.
+        page_cursors: The cursor that fetches each page index. A None entry means there is no such page.
+        page_index: The index of the page last returned by `next`.
+        page_cache_size: How many pages to keep in the page cache. 0 disables the cache.
+        page_cache_max_age: How many seconds a cached page stays valid, or None to keep it until evicted.
+        read_ahead: How many pages `flatten` and `stream_pages` fetch ahead of the consumer. 0 fetches one page at a time.
     """
 
-    def __init__(self, max_items: int = None):
+    def __init__(
+            self,
+            max_items: int = None,
+            page_cache_size: int = 0,
+            page_cache_max_age: Optional[float] = None,
+            read_ahead: int = 0
+    ):
         self.max_items: Optional[int] = max_items
+        self.read_ahead: int = read_ahead
+
+        self.page_cursors: list = [self._initial_cursor()]
+        self.page_index: int = -1
+        self.page_cache_size: int = page_cache_size
+        self.page_cache_max_age: Optional[float] = page_cache_max_age
+        self._page_cache: OrderedDict[int, tuple[float, list]] = OrderedDict()
+
+    def _initial_cursor(self):
+        """
+        Returns the cursor that fetches the first page.
+        """
+        return ""
+
+    def _set_cursor(self, cursor, started: bool):
+        """
+        Points the iterator at the page fetched by the passed cursor.
+        """
+        raise NotImplementedError
+
+    def _record_page(self, cursor, next_cursor, data: list):
+        """
+        Records the cursor used to fetch the page that was just returned by `next` and the cursor of the page after it.
+        """
+        self.page_index += 1
+        index = self.page_index
+
+        next_cursor = next_cursor if next_cursor else None
+
+        if index < len(self.page_cursors):
+            self.page_cursors[index] = cursor
+        else:
+            self.page_cursors.append(cursor)
+
+        if index + 1 < len(self.page_cursors):
+            self.page_cursors[index + 1] = next_cursor
+            if next_cursor is None:
+                # the list got shorter since the pages after this one were visited
+                del self.page_cursors[index + 2:]
+        else:
+            self.page_cursors.append(next_cursor)
+
+        if self.page_cache_size:
+            self._page_cache[index] = (time.monotonic(), data)
+            self._page_cache.move_to_end(index)
+            while len(self._page_cache) > self.page_cache_size:
+                self._page_cache.popitem(last=False)
+
+    def _next_from_cache(self) -> Optional[list]:
+        """
+        Returns the next page from the page cache and advances the iterator past it, or None if it isn't cached.
+        """
+        index = self.page_index + 1
+        cached = self._page_cache.get(index)
+        if cached is None:
+            return None
+
+        cached_at, data = cached
+        if self.page_cache_max_age is not None and time.monotonic() - cached_at > self.page_cache_max_age:
+            del self._page_cache[index]
+            return None
+
+        self._page_cache.move_to_end(index)
+        self.page_index = index
+        self._set_cursor(self.page_cursors[index + 1], True)
+        return data
+
+    def seek(self, index: int):
+        """
+        Positions the iterator so that the next call to `next` returns the page at the passed index.
+        Only pages whose cursor is already known can be seeked to.
+        """
+        if index < 0 or index >= len(self.page_cursors):
+            raise IndexError("The cursor for this page is not known yet.")
+
+        self.page_index = index - 1
+        self._set_cursor(self.page_cursors[index], index > 0)
+
+    def restart(self):
+        """
+        Moves the iterator back to the first page, keeping the recorded cursors and cached pages.
+        """
+        self.seek(0)
+
+    def clear_page_cache(self):
+        """
+        Drops all cached pages. Recorded cursors are kept.
+        """
+        self._page_cache.clear()
+
+    async def get_page_at(self, index: int) -> list:
+        """
+        Returns the page at the passed index (0-based).
+        Visited pages are fetched directly with their recorded cursor (or served from the page cache),
+        unvisited pages are reached by walking forward from the furthest known cursor.
+        """
+        if index < 0:
+            raise IndexError("Page index must not be negative.")
+
+        while index >= len(self.page_cursors):
+            last = len(self.page_cursors) - 1
+            if self.page_cursors[last] is None:
+                raise NoMoreItems("No more items.")
+            self.seek(last)
+            await self.next()
+
+        if self.page_cursors[index] is None:
+            raise NoMoreItems("No more items.")
+
+        self.seek(index)
+        return await self.next()
 
     async def next(self):
         """
@@ -114,6 +248,14 @@ class RobloxIterator:
 
         items: list = []
 
+        if self.read_ahead:
+            async with self.stream_pages() as pages:
+                async for new_items in pages:
+                    items += new_items
+                    if max_items is not None and len(items) >= max_items:
+                        break
+            return items[:max_items]
+
         while True:
             try:
                 new_items = await self.next()
@@ -126,6 +268,63 @@ class RobloxIterator:
 
         return items[:max_items]
 
+    @asynccontextmanager
+    async def stream_pages(self, read_ahead: int = None):
+        """
+        Returns an async context manager yielding an AsyncIterable of pages.
+        While the consumer works on a page, up to `read_ahead` following pages are fetched in the background,
+        so network time overlaps with consumer work. At most `read_ahead` pages are held ahead of the consumer.
+        Leaving the context early cancels any fetch still in flight.
+
+        Arguments:
+            read_ahead: How many pages to fetch ahead. Defaults to the iterator's `read_ahead`.
+        """
+        if read_ahead is None:
+            read_ahead = self.read_ahead
+
+        if read_ahead <= 0:
+            yield self.pages()
+            return
+
+        # the producer holds one page while it waits to send, so the buffer is one page smaller than the depth
+        send_channel, receive_channel = trio.open_memory_channel(read_ahead - 1)
+
+        async def produce():
+            # closed synchronously: an async close is a checkpoint where the consumer's cancellation
+            # would replace an exception raised by `next`
+            try:
+                while True:
+                    try:
+                        page = await self.next()
+                    except NoMoreItems:
+                        return
+                    await send_channel.send(page)
+            finally:
+                send_channel.close()
+
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(produce)
+            try:
+                yield receive_channel
+            finally:
+                nursery.cancel_scope.cancel()
+
+    @asynccontextmanager
+    async def stream_items(self, read_ahead: int = None):
+        """
+        Same as `stream_pages`, but yields an AsyncIterable of single items.
+
+        Arguments:
+            read_ahead: How many pages to fetch ahead. Defaults to the iterator's `read_ahead`.
+        """
+        async with self.stream_pages(read_ahead) as pages:
+            async def items():
+                async for page in pages:
+                    for item in page:
+                        yield item
+
+            yield items()
+
     def __aiter__(self):
         return IteratorItems(
             iterator=self,
@@ -179,7 +378,10 @@ class PageIterator(RobloxIterator):
             max_items: int = None,
             extra_parameters: Optional[dict] = None,
             handler: Optional[Callable] = None,
-            handler_kwargs: Optional[dict] = None
+            handler_kwargs: Optional[dict] = None,
+            page_cache_size: int = 0,
+            page_cache_max_age: Optional[float] = None,
+            read_ahead: int = 0
     ):
         """
         Parameters:
@@ -191,8 +393,16 @@ class PageIterator(RobloxIterator):
             extra_parameters: Extra parameters to pass to the endpoint.
             handler: A callable object to use to convert raw endpoint data to parsed objects.
             handler_kwargs: Extra keyword arguments to pass to the handler.
+            page_cache_size: How many visited pages to keep in the page cache. 0 disables the cache.
+            page_cache_max_age: How many seconds a cached page stays valid, or None to keep it until evicted.
+            read_ahead: How many pages to fetch ahead of the consumer when streaming pages.
         """
-        super().__init__(max_items=max_items)
+        super().__init__(
+            max_items=max_items,
+            page_cache_size=page_cache_size,
+            page_cache_max_age=page_cache_max_age,
+            read_ahead=read_ahead
+        )
 
         self._client: Client = client
 
@@ -214,10 +424,18 @@ class PageIterator(RobloxIterator):
         self.iterator_items: list = []
         self.next_started: bool = False
 
+    def _set_cursor(self, cursor, started: bool):
+        self.next_cursor = cursor
+        self.next_started = started
+
     async def next(self):
         """
         Advances the iterator to the next page.
         """
+        cached = self._next_from_cache()
+        if cached is not None:
+            return cached
+
         if self.next_started and not self.next_cursor:
             """
             If we just started and there is no cursor, this is the last page, because we can go back but not forward.
@@ -228,10 +446,11 @@ class PageIterator(RobloxIterator):
         if not self.next_started:
             self.next_started = True
 
+        cursor = self.next_cursor
         page_response = await self._client.requests.get(
             url=self.url,
             params={
-                "cursor": self.next_cursor,
+                "cursor": cursor,
                 "limit": self.page_size,
                 "sortOrder": self.sort_order.value,
                 **self.extra_parameters
@@ -267,12 +486,31 @@ class PageIterator(RobloxIterator):
                 ) for item_data in data
             ]
 
+        self._record_page(cursor, self.next_cursor, data)
         return data
 
 
+class ConcurrentIteratorPages(IteratorPages):
+    """
+    Represents the pages inside of a PageNumberIterator, fetched several pages at a time.
+    """
+
+    def __init__(self, iterator: PageNumberIterator):
+        super().__init__(iterator)
+        self._buffer: list = []
+
+    async def __anext__(self):
+        if not self._buffer:
+            self._buffer = await self._iterator.next_pages()
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.pop(0)
+
+
 class PageNumberIterator(RobloxIterator):
     """
     Represents an iterator that is advanced with page numbers and sizes, like those seen on chat.roblox.com.
+    Pages are independent of each other, so `flatten` and `pages` fetch up to `max_concurrency` pages at once.
 
     Attributes:
         url: The endpoint to hit for new page data.
@@ -281,6 +519,7 @@ class PageNumberIterator(RobloxIterator):
         extra_parameters: Extra parameters to pass to the endpoint.
         handler: A callable object to use to convert raw endpoint data to parsed objects.
         handler_kwargs: Extra keyword arguments to pass to the handler.
+        max_concurrency: How many pages `flatten` and `pages` may fetch at the same time.
     """
 
     def __init__(
@@ -290,15 +529,24 @@ class PageNumberIterator(RobloxIterator):
             page_size: int = 10,
             extra_parameters: Optional[dict] = None,
             handler: Optional[Callable] = None,
-            handler_kwargs: Optional[dict] = None
+            handler_kwargs: Optional[dict] = None,
+            page_cache_size: int = 0,
+            page_cache_max_age: Optional[float] = None,
+            read_ahead: int = 0,
+            max_concurrency: int = 4
     ):
-        super().__init__()
+        super().__init__(
+            page_cache_size=page_cache_size,
+            page_cache_max_age=page_cache_max_age,
+            read_ahead=read_ahead
+        )
 
         self._client: Client = client
 
         self.url: str = url
         self.page_number: int = 1
         self.page_size: int = page_size
+        self.max_concurrency: int = max_concurrency
 
         self.extra_parameters: dict = extra_parameters or {}
         self.handler: Callable = handler
@@ -307,14 +555,28 @@ class PageNumberIterator(RobloxIterator):
         self.iterator_position = 0
         self.iterator_items = []
 
-    async def next(self):
+    def _initial_cursor(self):
+        return 1
+
+    def _set_cursor(self, cursor, started: bool):
+        self.page_number = cursor
+
+    def _mark_end(self, page_number: int):
         """
-        Advances the iterator to the next page.
+        Records that the passed page number is past the last page.
+        """
+        self.page_number = None
+        if self.page_cursors and self.page_cursors[-1] == page_number:
+            self.page_cursors[-1] = None
+
+    async def _fetch_page(self, page_number: int) -> list:
+        """
+        Fetches a single page by number without moving the iterator.
         """
         page_response = await self._client.requests.get(
             url=self.url,
             params={
-                "pageNumber": self.page_number,
+                "pageNumber": page_number,
                 "pageSize": self.page_size,
                 **self.extra_parameters
             }
@@ -324,8 +586,6 @@ class PageNumberIterator(RobloxIterator):
         if len(data) == 0:
             raise NoMoreItems("No more items.")
 
-        self.page_number += 1
-
         if self.handler:
             data = [
                 self.handler(
@@ -337,6 +597,151 @@ class PageNumberIterator(RobloxIterator):
 
         return data
 
+    async def next(self):
+        """
+        Advances the iterator to the next page.
+        """
+        cached = self._next_from_cache()
+        if cached is not None:
+            return cached
+
+        if self.page_number is None:
+            raise NoMoreItems("No more items.")
+
+        page_number = self.page_number
+        try:
+            data = await self._fetch_page(page_number)
+        except NoMoreItems:
+            self._mark_end(page_number)
+            raise
+
+        self.page_number += 1
+        self._record_page(page_number, self.page_number, data)
+        return data
+
+    async def get_page_at(self, index: int) -> list:
+        """
+        Returns the page at the passed index (0-based). Page numbers don't depend on earlier pages,
+        so any page can be fetched directly.
+        """
+        if index < 0:
+            raise IndexError("Page index must not be negative.")
+        if index < len(self.page_cursors) and self.page_cursors[index] is None:
+            raise NoMoreItems("No more items.")
+
+        # keep the cursor list contiguous so seek and the page cache stay valid
+        while len(self.page_cursors) <= index:
+            self.page_cursors.append(len(self.page_cursors) + 1)
+
+        self.seek(index)
+        return await self.next()
+
+    async def _fetch_window(self, first_page: int, count: int, results: dict) -> Optional[int]:
+        """
+        Fetches `count` pages starting at `first_page`, at most `max_concurrency` at a time, into `results`.
+        Pages past the first empty page are cancelled as soon as it is found.
+
+        Returns:
+            The number of the first empty page, or None if every page had data.
+        """
+        last_page: Optional[int] = None
+        cancel_scopes: dict[int, trio.CancelScope] = {}
+        limiter = trio.Semaphore(max(self.max_concurrency, 1))
+
+        async def fetch(page_number: int):
+            nonlocal last_page
+            with trio.CancelScope() as cancel_scope:
+                cancel_scopes[page_number] = cancel_scope
+                try:
+                    if last_page is not None and page_number > last_page:
+                        return
+                    try:
+                        results[page_number] = await self._fetch_page(page_number)
+                    except NoMoreItems:
+                        if last_page is None or page_number < last_page:
+                            last_page = page_number
+                        # cancel the speculative requests past the end of the data
+                        for other_page, other_scope in cancel_scopes.items():
+                            if other_page > page_number:
+                                other_scope.cancel()
+                finally:
+                    del cancel_scopes[page_number]
+                    limiter.release()
+
+        async with trio.open_nursery() as nursery:
+            for page_number in range(first_page, first_page + count):
+                await limiter.acquire()
+                if last_page is not None:
+                    limiter.release()
+                    break
+                nursery.start_soon(fetch, page_number)
+
+        return last_page
+
+    def _consume_window(self, first_page: int, results: dict, last_page: Optional[int]) -> list:
+        """
+        Moves the iterator past the pages in `results` that directly follow `first_page` and returns them in order.
+        """
+        pages = []
+        page_number = first_page
+        while page_number in results and (last_page is None or page_number < last_page):
+            self.page_number = page_number + 1
+            self._record_page(page_number, self.page_number, results[page_number])
+            pages.append(results[page_number])
+            page_number += 1
+
+        if last_page is not None and page_number == last_page:
+            self._mark_end(last_page)
+        return pages
+
+    async def next_pages(self, count: int = None) -> list:
+        """
+        Advances the iterator by up to `count` pages (defaults to `max_concurrency`), fetching them concurrently.
+
+        Returns:
+            The pages in order. Empty once there are no more pages.
+        """
+        if count is None:
+            count = self.max_concurrency
+
+        cached = self._next_from_cache()
+        if cached is not None:
+            return [cached]
+        if self.page_number is None:
+            return []
+
+        first_page = self.page_number
+        results: dict = {}
+        last_page = await self._fetch_window(first_page, count, results)
+        return self._consume_window(first_page, results, last_page)
+
+    async def flatten(self, max_items: int = None) -> list:
+        """
+        Flattens the data into a list, fetching up to `max_concurrency` pages at a time.
+        """
+        if max_items is None:
+            max_items = self.max_items
+        if self.max_concurrency <= 1 or self.page_number is None:
+            return await super().flatten(max_items)
+
+        items: list = []
+        while max_items is None or len(items) < max_items:
+            remaining = None if max_items is None else -(-(max_items - len(items)) // self.page_size)
+            count = self.max_concurrency * 4 if remaining is None else max(remaining, 1)
+            pages = await self.next_pages(count)
+            if not pages:
+                break
+            for page in pages:
+                items += page
+
+        return items[:max_items]
+
+    def pages(self) -> IteratorPages:
+        """
+        Returns an AsyncIterable containing each iterator page, fetched up to `max_concurrency` pages at a time.
+        """
+        return ConcurrentIteratorPages(self)
+
 
 class CursoredPageIterator(RobloxIterator):
     """
@@ -357,7 +762,10 @@ class CursoredPageIterator(RobloxIterator):
             extra_url_parameters: dict,
             max_items: Optional[int] = None,
             handler: Optional[Callable] = None,
-            handler_kwargs: Optional[dict] = None
+            handler_kwargs: Optional[dict] = None,
+            page_cache_size: int = 0,
+            page_cache_max_age: Optional[float] = None,
+            read_ahead: int = 0
     ) -> None:
         """
         Parameters:
@@ -367,8 +775,16 @@ class CursoredPageIterator(RobloxIterator):
             extra_url_parameters: Extra url parameters to pass to the endpoint.
             handler: A callable object to use to convert raw endpoint data to parsed objects.
             handler_kwargs: Extra keyword arguments to pass to the handler.
+            page_cache_size: How many visited pages to keep in the page cache. 0 disables the cache.
+            page_cache_max_age: How many seconds a cached page stays valid, or None to keep it until evicted.
+            read_ahead: How many pages to fetch ahead of the consumer when streaming pages.
         """
-        super().__init__(max_items=max_items)
+        super().__init__(
+            max_items=max_items,
+            page_cache_size=page_cache_size,
+            page_cache_max_age=page_cache_max_age,
+            read_ahead=read_ahead
+        )
 
         self._client: Client = client
 
@@ -384,10 +800,18 @@ class CursoredPageIterator(RobloxIterator):
         self.next_cursor: Optional[str] = None
         self.previous_cursor: Optional[str] = None
 
+    def _set_cursor(self, cursor, started: bool):
+        self.next_cursor = cursor
+        self.started = started
+
     async def next(self) -> list[Any]:
         """
         Advances the iterator to the next page.
         """
+        cached = self._next_from_cache()
+        if cached is not None:
+            return cached
+
         if self.started and not self.next_cursor:
             """
             If we just started and there is no cursor, this is the last page, because we can go back but not forward.
@@ -398,10 +822,11 @@ class CursoredPageIterator(RobloxIterator):
         if not self.started:
             self.started = True
 
+        cursor = self.next_cursor if self.next_cursor else ""
         response = await self._client.requests.get(
             url=self.url,
             params={
-                "cursor": self.next_cursor if self.next_cursor else "",
+                "cursor": cursor,
                 **self.extra_url_parameters
             }
         )
@@ -420,6 +845,7 @@ class CursoredPageIterator(RobloxIterator):
                 ) for page_data in page_items
             ]
 
+        self._record_page(cursor, self.next_cursor, page_items)
         return page_items
 
 
@@ -434,9 +860,16 @@ class OmniPageIterator(RobloxIterator):
             url: str,
             extra_url_parameters: dict,
             handler: Optional[Callable] = None,
-            handler_kwargs: Optional[dict] = None
+            handler_kwargs: Optional[dict] = None,
+            page_cache_size: int = 0,
+            page_cache_max_age: Optional[float] = None,
+            read_ahead: int = 0
     ) -> None:
-        super().__init__()
+        super().__init__(
+            page_cache_size=page_cache_size,
+            page_cache_max_age=page_cache_max_age,
+            read_ahead=read_ahead
+        )
 
         self._client: Client = client
 
@@ -451,20 +884,29 @@ class OmniPageIterator(RobloxIterator):
         self.started: bool = False
         self.next_cursor: str = ""
 
+    def _set_cursor(self, cursor, started: bool):
+        self.next_cursor = cursor
+        self.started = started
+
     async def next(self) -> list[Any]:
         """
         Advances the iterator to the next page.
         """
+        cached = self._next_from_cache()
+        if cached is not None:
+            return cached
+
         if self.started and not self.next_cursor:
             raise NoMoreItems("No more items.")
 
         if not self.started:
             self.started = True
 
+        cursor = self.next_cursor if self.next_cursor else ""
         response = await self._client.requests.cache_get(
             url=self.url,
             params={
-                "pageToken": self.next_cursor if self.next_cursor else "",
+                "pageToken": cursor,
                 **self.extra_url_parameters
             }
         )
@@ -482,4 +924,5 @@ class OmniPageIterator(RobloxIterator):
                 ) for page_data in page_items
             ]
 
+        self._record_page(cursor, self.next_cursor, page_items)
         return page_items
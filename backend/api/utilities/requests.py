@@ -7,7 +7,11 @@ This module contains classes used internally by ro.py for sending requests to Ro
 from __future__ import annotations
 
 import gc
-from typing import Dict
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Optional
 import time
 import tempfile
 import hashlib
@@ -26,6 +30,142 @@ _xcsrf_allowed_methods: Dict[str, bool] = {
 }
 
 
+class Lane(IntEnum):
+    """
+    Request priority lanes, most urgent first.
+    """
+    interactive = 0
+    prefetch = 1
+    background = 2
+
+
+_current_lane: ContextVar[Lane] = ContextVar("request_lane", default=Lane.interactive)
+
+
+@contextmanager
+def request_lane(lane: Lane):
+    """
+    Sends the requests made inside the block (including from trio tasks and `trio.run` calls started in it)
+    in the passed lane. Requests are interactive by default.
+    """
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane() -> Lane:
+    """Returns the lane requests made in the current context are sent in."""
+    return _current_lane.get()
+
+
+class LaneScheduler:
+    """
+    Admits requests by priority lane, so background work only uses capacity the user isn't using.
+
+    Interactive requests are always sent right away. Prefetch requests are delayed while many interactive
+    requests are in flight, background requests while any are. Each lower lane also has its own concurrency
+    limit. A delayed request is sent anyway after its lane's `max_delays` entry, so lower lanes can't starve.
+
+    Requests come from several event loops on different threads, so the counters are guarded by a lock and
+    delayed requests poll instead of waiting on a trio primitive.
+    """
+
+    def __init__(
+            self,
+            prefetch_limit: int = 6,
+            background_limit: int = 2,
+            interactive_busy: int = 4,
+            max_delays: Optional[Dict[Lane, float]] = None,
+            poll_interval: float = 0.01
+    ):
+        """
+        Arguments:
+            prefetch_limit: How many prefetch requests may be in flight.
+            background_limit: How many background requests may be in flight.
+            interactive_busy: How many interactive requests in flight hold back prefetch requests.
+            max_delays: The longest a request of each lower lane is delayed.
+            poll_interval: How often delayed requests check whether they may be sent.
+        """
+        self.limits = {Lane.prefetch: prefetch_limit, Lane.background: background_limit}
+        self.interactive_busy = interactive_busy
+        self.max_delays = max_delays or {Lane.prefetch: 2.0, Lane.background: 10.0}
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self.in_flight = {lane: 0 for lane in Lane}
+        self.requests = {lane: 0 for lane in Lane}
+        self.delayed = {lane: 0 for lane in Lane}
+        self.forced = {lane: 0 for lane in Lane}
+        self.wait_seconds = {lane: 0.0 for lane in Lane}
+        # time from asking to send a request until its response, including any delay
+        self.latencies = {lane: deque(maxlen=512) for lane in Lane}
+
+    def _try_admit(self, lane: Lane, waited: float) -> bool:
+        with self._lock:
+            admitted = lane == Lane.interactive or (
+                self.in_flight[lane] < self.limits[lane] and (
+                    self.in_flight[Lane.interactive] < self.interactive_busy if lane == Lane.prefetch
+                    else self.in_flight[Lane.interactive] == 0))
+            if not admitted and waited >= self.max_delays[lane]:
+                self.forced[lane] += 1
+                admitted = True
+            if admitted:
+                self.in_flight[lane] += 1
+                self.requests[lane] += 1
+                if waited:
+                    self.delayed[lane] += 1
+                    self.wait_seconds[lane] += waited
+            return admitted
+
+    async def acquire(self, lane: Lane) -> float:
+        """
+        Waits until a request in the passed lane may be sent.
+
+        Returns:
+            How many seconds the request was delayed.
+        """
+        started_at = time.perf_counter()
+        waited = 0.0
+        while not self._try_admit(lane, waited):
+            await trio.sleep(self.poll_interval)
+            waited = time.perf_counter() - started_at
+        return waited
+
+    def acquire_sync(self, lane: Lane) -> float:
+        """
+        Blocking version of `acquire`, for requests sent outside trio.
+        """
+        started_at = time.perf_counter()
+        waited = 0.0
+        while not self._try_admit(lane, waited):
+            time.sleep(self.poll_interval)
+            waited = time.perf_counter() - started_at
+        return waited
+
+    def release(self, lane: Lane, latency: float):
+        with self._lock:
+            self.in_flight[lane] -= 1
+            self.latencies[lane].append(latency)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for lane in Lane:
+                latencies = sorted(self.latencies[lane])
+                stats[lane.name] = {
+                    "requests": self.requests[lane],
+                    "inFlight": self.in_flight[lane],
+                    "delayed": self.delayed[lane],
+                    "forced": self.forced[lane],
+                    "waitSeconds": self.wait_seconds[lane],
+                    "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                    "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+                }
+            return stats
+
+
 class CleanAsyncClient(AsyncClient):
     """
     This is a clean-on-delete version of httpx.AsyncClient.
@@ -62,7 +202,8 @@ class Requests:
         """
         self.session: CleanAsyncClient
         self._custom_session = session is not None
-        self._current_trio_token = None
+        # the session of each event loop, see _session_for_context
+        self._loop_sessions: trio.lowlevel.RunVar = trio.lowlevel.RunVar("requests_session")
 
         if session is None:
             self.session = CleanAsyncClient()
@@ -70,31 +211,44 @@ class Requests:
             self.session = session
 
         self.xcsrf_token_name: str = xcsrf_token_name
+        self.scheduler: LaneScheduler = LaneScheduler()
         self._disk_cache_dir = Path(tempfile.gettempdir()) / "rolauncher_cache"
         self._disk_cache_dir.mkdir(exist_ok=True)
 
         self.session.headers["User-Agent"] = "Roblox/WinInet"
         self.session.headers["Referer"] = "www.roblox.com"
 
-    def _ensure_session_for_context(self):
-        """Ensure the session is valid for the current trio context."""
+    def _new_session(self) -> CleanAsyncClient:
+        """Creates a session with the base session's headers, sharing its cookie jar."""
+        session = CleanAsyncClient()
+        session.headers = self.session.headers
+        session.cookies = self.session.cookies.jar
+        return session
+
+    def _session_for_context(self) -> CleanAsyncClient:
+        """
+        Returns the session to send requests from the current event loop with.
+
+        httpx connections are bound to the event loop that opened them, and js_api calls, background scans and
+        the late loop all send requests from event loops of their own, so each loop gets its own session
+        instead of replacing a shared one under the others. Every session shares the base session's cookie
+        jar and picks up changes to its headers before each request.
+        """
         if self._custom_session:
-            return
+            return self.session
 
         try:
-            import trio
-            current_token = trio.lowlevel.current_trio_token()
-            if self._current_trio_token != current_token:
-                old_headers = dict(self.session.headers)
-                old_cookies = self.session.cookies
-                self.session = CleanAsyncClient()
-                for key, value in old_headers.items():
-                    self.session.headers[key] = value
-
-                self.session.cookies = old_cookies
-                self._current_trio_token = current_token
+            session = self._loop_sessions.get()
+        except LookupError:
+            session = self._new_session()
+            self._loop_sessions.set(session)
         except RuntimeError:
-            pass
+            # not in a trio event loop
+            return self.session
+
+        if session.headers != self.session.headers:
+            session.headers = self.session.headers
+        return session
 
     def _get_cache_key(self, method, *args, **kwargs):
         def make_hashable(value):
@@ -171,11 +325,11 @@ class Requests:
         except (pickle.PickleError, OSError):
             pass
 
-    async def _make_request(self, method: str, *args, **kwargs) -> Response:
+    async def _make_request(self, session: CleanAsyncClient, method: str, *args, **kwargs) -> Response:
         """Internal method to make HTTP request with retries."""
         for attempt in range(3):
             try:
-                return await self.session.request(method, *args, **kwargs)
+                return await session.request(method, *args, **kwargs)
             except ValueError as e:
                 if "list.remove(x): x not in list" in str(e) and attempt < 2:
                     await trio.sleep(0.1 * (attempt + 1))
@@ -196,8 +350,7 @@ class Requests:
             An HTTP response.
         """
 
-        # Ensure session is valid for current trio context
-        self._ensure_session_for_context()
+        session = self._session_for_context()
 
         handle_xcsrf_token = kwargs.pop("handle_xcsrf_token", True)
         disk_cache = kwargs.pop("disk_cache", None)
@@ -215,8 +368,14 @@ class Requests:
                         #     f"Refreshing cache for {method} {cache_key}", flush=True)
                         loop = asyncio.new_event_loop()
                         asyncio.set_event_loop(loop)
-                        fresh_response = loop.run_until_complete(
-                            self._make_request(method, *args, **kwargs))
+                        # revalidating the cache is background work
+                        started_at = time.perf_counter()
+                        self.scheduler.acquire_sync(Lane.background)
+                        try:
+                            fresh_response = loop.run_until_complete(
+                                self._make_request(self._new_session(), method, *args, **kwargs))
+                        finally:
+                            self.scheduler.release(Lane.background, time.perf_counter() - started_at)
                         if not self._is_error_response(fresh_response):
                             self._set_disk_cache(cache_key, fresh_response)
                         loop.close()
@@ -227,12 +386,19 @@ class Requests:
                                  daemon=True).start()
                 return cached_response
 
-        response = await self._make_request(method, *args, **kwargs)
-
-        if handle_xcsrf_token and self.xcsrf_token_name in response.headers and _xcsrf_allowed_methods.get(method.lower()):
-            self.session.headers[self.xcsrf_token_name] = response.headers[self.xcsrf_token_name]
-            if response.status_code == 403:
-                response = await self.session.request(method, *args, **kwargs)
+        lane = _current_lane.get()
+        started_at = time.perf_counter()
+        await self.scheduler.acquire(lane)
+        try:
+            response = await self._make_request(session, method, *args, **kwargs)
+
+            if handle_xcsrf_token and self.xcsrf_token_name in response.headers and _xcsrf_allowed_methods.get(method.lower()):
+                self.session.headers[self.xcsrf_token_name] = response.headers[self.xcsrf_token_name]
+                session.headers[self.xcsrf_token_name] = response.headers[self.xcsrf_token_name]
+                if response.status_code == 403:
+                    response = await session.request(method, *args, **kwargs)
+        finally:
+            self.scheduler.release(lane, time.perf_counter() - started_at)
 
         gc.collect()  # Aggresive garbage collection every request ehe :P
 
@@ -6,10 +6,13 @@ from mapping.auth import Auth
 from mapping.utility import Utility
 from updater import Updater
 from mapping.realtime import Realtime
+from mapping.events import event_bus
+from mapping.tasks import shared_loop
 import os
 import sys
 import argparse
 import webview
+import trio
 import api
 import ctypes
 import psutil
@@ -24,12 +27,61 @@ class Api:
                             if get_last_account() else None)
         initialize_database()
         self.client = client
-        self.auth = Auth(client)
-        self.user = User(client)
+        self.auth = Auth(client, lambda: self.realtime, lambda: self.friends)
+        self.user = User(client, lambda: self.friends)
         self.games = Games(client)
-        self.friends = Friends(client)
+        self.friends = Friends(client, lambda: self.games)
         self.utility = Utility(client, lambda: self.auth)
-        Realtime(client, lambda: self.user)
+        self.realtime = Realtime(client, lambda: self.user)
+        self.realtime.accounts.on_friendship = self.friends.apply_notification
+
+    def batch(self, calls: list, stream: bool = False):
+        """
+        Runs several js_api calls in one bridge call. The calls run concurrently and their async work shares one
+        event loop (and with it one HTTP session) instead of starting a loop per call.
+
+        Arguments:
+            calls: A list of {"id", "target", "method", "args", "kwargs"} dicts, e.g.
+                {"id": "accounts", "target": "auth", "method": "get_all_accounts"}. A call without an ID is
+                identified by its index.
+            stream: Whether to also emit each result as a `batchResult` event as soon as it is ready.
+
+        Returns:
+            {call ID: {"result": ..., "error": None or the error message}}.
+        """
+        targets = {"auth": self.auth, "user": self.user, "games": self.games,
+                   "friends": self.friends, "utility": self.utility, "realtime": self.realtime}
+        results = {}
+
+        def run_sync(trio_token, method, args, kwargs):
+            with shared_loop(trio_token):
+                return method(*args, **kwargs)
+
+        async def run(index: int, call: dict):
+            call_id = index
+            try:
+                call_id = call.get("id", index)
+                target = targets[call["target"]]
+                if call["method"].startswith("_"):
+                    raise AttributeError(f"{call['method']} is not exposed")
+                method = getattr(target, call["method"])
+                result = {"result": await trio.to_thread.run_sync(
+                    run_sync, trio.lowlevel.current_trio_token(), method,
+                    call.get("args") or [], call.get("kwargs") or {}), "error": None}
+            except Exception as e:
+                print(f"Error in batched call {call_id}: {e}", flush=True)
+                result = {"result": None, "error": str(e)}
+            results[call_id] = result
+            if stream:
+                event_bus.emit("batchResult", {"id": call_id, **result})
+
+        async def run_all():
+            async with trio.open_nursery() as nursery:
+                for index, call in enumerate(calls):
+                    nursery.start_soon(run, index, call)
+
+        trio.run(run_all)
+        return results
 
 
 class Cli_Api:
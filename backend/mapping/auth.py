@@ -2,11 +2,15 @@ import trio
 import webview
 import api
 import mapping.database as database
+from .joins import image_index
+from .tasks import run_call
 
 
 class Auth:
-    def __init__(self, client: api.Client):
+    def __init__(self, client: api.Client, realtime=None, friends=None):
         self.client = client
+        self.realtime = realtime
+        self.friends = friends
 
     def _login_prompt(self):
         loginwindow: webview.Window = webview.create_window(
@@ -32,7 +36,7 @@ class Auth:
                         }
                 await trio.sleep(1)
 
-        return trio.run(check_cookie)
+        return run_call(check_cookie)
 
     def login(self):
         account = self._login_prompt()
@@ -51,8 +55,15 @@ class Auth:
 
     def switch_account(self, account_id):
         account = self.get_account(account_id)
+        accounts = self.realtime().accounts if self.realtime else None
+        if accounts:
+            accounts.detach(database.get_last_account(), self.client.presence)
         self.client.set_token(account['cookie'])
         database.set_last_account(account_id)
+        if self.friends:
+            self.friends().set_active_account(account_id)
+        if accounts:
+            accounts.attach(account_id, self.client.presence)
         return {
             'id': account['id'],
             'name': account['name'],
@@ -72,31 +83,33 @@ class Auth:
             image = await self.client.thumbnails.get_user_avatar_thumbnails(
                 accounts_ids, api.AvatarThumbnailType.headshot, (48, 48)
             )
+            images = image_index(image)
             return [
                 {
                     'id': account['id'],
                     'name': account['name'],
                     'displayName': account['display_name'],
-                    'image': next(
-                        (img.image_url for img in image if img.target_id ==
-                         account['id']), None
-                    )
+                    'image': images.get(account['id'])
                 }
                 for account in accounts
             ]
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_account(self, account_id):
         return database.get_account(account_id)
 
     def delete_account(self, account_id):
+        if self.realtime:
+            self.realtime().accounts.close(account_id)
         database.delete_account(account_id)
+        if self.friends:
+            self.friends().set_active_account(None)
 
     def get_authentication_ticket(self):
-        return trio.run(self.client.get_authentication_ticket)
+        return run_call(self.client.get_authentication_ticket)
 
     def get_authentication_ticket_from_token(self, token: str):
         async def fetch_ticket():
             return await self.client.get_authentication_ticket_from_token(token)
-        return trio.run(fetch_ticket)
+        return run_call(fetch_ticket)
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+import webview
+
+FRAME_INTERVAL = 1 / 60
+
+
+class EventBus:
+    """
+    Collects UI events and delivers them once per animation frame, in a single evaluate_js call per window.
+
+    Entity updates (lists of dicts identified by a key field such as "id") are merged per entity while a frame is
+    pending, so an entity updated several times within a frame is sent once with every field it was given.
+    Nothing is kept once a frame is delivered: the UI also gets entities from js_api returns, so what the bus last
+    sent is not what the UI shows. Events are delivered in the order they were first emitted within a frame.
+    """
+
+    def __init__(self, frame_interval: float = FRAME_INTERVAL, windows=None):
+        self.frame_interval = frame_interval
+        # returns the windows to deliver to, every open window by default
+        self.windows = windows or (lambda: webview.windows)
+
+        self._condition = threading.Condition()
+        # event name -> detail list (plain events) or {entity key: merged fields} (entity events)
+        self._pending: dict[str, object] = {}
+        self._last_flush = 0.0
+        self._thread: threading.Thread = None
+
+        self.events = 0
+        self.entities_sent = 0
+        self.entities_merged = 0
+        self.frames = 0
+        self.payload_bytes = 0
+        self.dispatch_seconds = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def emit(self, event_name: str, detail, replace: bool = False):
+        """
+        Queues an event for the next frame.
+
+        Arguments:
+            event_name: The CustomEvent name.
+            detail: The event detail.
+            replace: Whether this detail replaces a pending one with the same name instead of being sent after it.
+        """
+        with self._condition:
+            self.events += 1
+            pending = self._pending.get(event_name)
+            if replace or pending is None:
+                self._pending[event_name] = [detail]
+            else:
+                pending.append(detail)
+            self._ensure_thread()
+            self._condition.notify()
+
+    def emit_entities(self, event_name: str, entities: list[dict], key: str = "id"):
+        """
+        Queues entity updates for the next frame. The event is delivered with a list of entities, each with the
+        fields of every update queued for it since the last frame.
+
+        Arguments:
+            event_name: The CustomEvent name.
+            entities: The updated entities.
+            key: The field identifying an entity.
+        """
+        with self._condition:
+            self.events += 1
+            pending = self._pending.setdefault(event_name, {})
+            for entity in entities:
+                fields = pending.get(entity[key])
+                if fields is None:
+                    pending[entity[key]] = dict(entity)
+                else:
+                    fields.update(entity)
+                    self.entities_merged += 1
+            self._ensure_thread()
+            self._condition.notify()
+
+    def _take_frame(self) -> list:
+        with self._condition:
+            pending, self._pending = self._pending, {}
+            frame = []
+            for event_name, details in pending.items():
+                if isinstance(details, list):
+                    frame.extend((event_name, detail) for detail in details)
+                    continue
+
+                self.entities_sent += len(details)
+                frame.append((event_name, list(details.values())))
+            return frame
+
+    def flush(self):
+        """
+        Delivers every pending event now.
+        """
+        frame = self._take_frame()
+        self._last_flush = time.monotonic()
+        if not frame:
+            return
+
+        started_at = time.perf_counter()
+        payload = json.dumps(frame, separators=(",", ":"))
+        script = ("for (const [n, d] of " + payload + ") "
+                  "window.dispatchEvent(new CustomEvent(n, {detail: d}))")
+        for main_window in self.windows():
+            try:
+                main_window.evaluate_js(script)
+            except webview.JavascriptException as e:
+                print(f"Error dispatching events: {e}", flush=True)
+
+        self.frames += 1
+        self.payload_bytes += len(payload)
+        self.dispatch_seconds += time.perf_counter() - started_at
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # let the rest of this frame's events arrive
+            delay = self._last_flush + self.frame_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "events": self.events,
+            "frames": self.frames,
+            "entitiesSent": self.entities_sent,
+            "entitiesMerged": self.entities_merged,
+            "payloadBytes": self.payload_bytes,
+            "dispatchSeconds": self.dispatch_seconds,
+            "secondsPerEvent": self.dispatch_seconds / self.events if self.events else 0.0,
+            "eventsPerFrame": self.events / self.frames if self.frames else 0.0,
+        }
+
+
+event_bus = EventBus()
+
+
+def dispatch_event(event_name: str, detail, replace: bool = False):
+    """Queue a CustomEvent with the given detail for the next frame on every open window."""
+    event_bus.emit(event_name, detail, replace)
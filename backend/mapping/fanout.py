@@ -0,0 +1,181 @@
+import threading
+from typing import Awaitable, Callable
+
+import trio
+from api.utilities.requests import current_lane, request_lane
+
+# How long children that missed the budget keep running for their follow-up results
+LATE_BUDGET = 30.0
+
+
+class LateLoop:
+    """
+    A long-lived event loop on a background thread, for work that outlives the js_api call that started it.
+    Every js_api call runs on its own event loop, which ends when the call returns.
+    """
+
+    def __init__(self):
+        self.trio_token = None
+        self._nursery: trio.Nursery = None
+        self._thread: threading.Thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    async def _main(self):
+        async with trio.open_nursery() as nursery:
+            self._nursery = nursery
+            self.trio_token = trio.lowlevel.current_trio_token()
+            self._ready.set()
+            await trio.sleep_forever()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=trio.run, args=(self._main,), daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    def start_soon(self, async_fn, *args):
+        """Starts `async_fn(*args)` on the loop. Can be called from any thread or event loop, including this one."""
+        self._ensure_started()
+        self.trio_token.run_sync_soon(self._nursery.start_soon, async_fn, *args)
+
+    def run_sync_soon(self, sync_fn, *args):
+        """Calls `sync_fn(*args)` on the loop, e.g. to cancel a scope of work running on it."""
+        self._ensure_started()
+        self.trio_token.run_sync_soon(sync_fn, *args)
+
+
+late_loop = LateLoop()
+
+
+class FanOut:
+    """
+    Runs independent coroutines concurrently and waits for them for at most `budget` seconds.
+
+    The children run on the `late_loop`, in the caller's request lane, so they can outlive the call. `run`
+    returns whatever finished within the budget and names the rest as missing, so the caller isn't held up by
+    the slowest one. The others keep running for up to `late_budget` more seconds, and their results are
+    passed to `on_result` with `late=True`, typically to send them to the UI as follow-up events. A child that
+    raises is missing and never reported.
+    """
+
+    def __init__(
+            self,
+            children: dict[str, Callable[[], Awaitable]],
+            budget: float,
+            late_budget: float = LATE_BUDGET,
+            on_result: Callable[[str, object, bool], None] = None
+    ):
+        """
+        Arguments:
+            children: The coroutine functions to run, by name.
+            budget: How many seconds `run` waits for the children.
+            late_budget: How many more seconds children that missed the budget may take.
+            on_result: Called from the late loop's thread with (name, result, late) as each child finishes.
+        """
+        self.children = children
+        self.budget = budget
+        self.late_budget = late_budget
+        self.on_result = on_result
+
+        self.results: dict[str, object] = {}
+        self.failed: set[str] = set()
+        self.late: set[str] = set()
+
+        self._running = 0
+        self._returned = False
+        self._cancelled = False
+        self._lock = threading.Lock()
+        self._cancel_scope: trio.CancelScope = None
+        # set on the caller's event loop once every child is done
+        self._finished: trio.Event = None
+        self._trio_token = None
+
+    async def _run_child(self, name: str, child: Callable[[], Awaitable]):
+        try:
+            result = await child()
+        except Exception as e:
+            print(f"Error in {name}: {e}", flush=True)
+            with self._lock:
+                self._running -= 1
+                self.failed.add(name)
+            return
+
+        with self._lock:
+            self._running -= 1
+            if self._cancelled:
+                return
+            self.results[name] = result
+            late = self._returned
+            if late:
+                self.late.add(name)
+            on_result = self.on_result
+        if on_result:
+            try:
+                on_result(name, result, late)
+            except Exception as e:
+                print(f"Error handling {name}: {e}", flush=True)
+
+    async def _run_children(self, lane):
+        cancel_scope = trio.move_on_after(self.budget + self.late_budget)
+        with self._lock:
+            self._cancel_scope = cancel_scope
+            if self._cancelled:
+                cancel_scope.cancel()
+        try:
+            with request_lane(lane), cancel_scope:
+                async with trio.open_nursery() as nursery:
+                    for name, child in self.children.items():
+                        nursery.start_soon(self._run_child, name, child)
+        finally:
+            with self._lock:
+                self._running = 0
+            try:
+                self._trio_token.run_sync_soon(self._finished.set)
+            except trio.RunFinishedError:
+                pass
+
+    async def run(self) -> tuple[dict, list[str]]:
+        """
+        Starts the children and waits until they are all done or the budget runs out.
+
+        Returns:
+            The results of the children that finished in time, and the names of the others.
+        """
+        self._trio_token = trio.lowlevel.current_trio_token()
+        self._finished = trio.Event()
+        with self._lock:
+            self._running = len(self.children)
+        late_loop.start_soon(self._run_children, current_lane())
+        try:
+            with trio.move_on_after(self.budget):
+                await self._finished.wait()
+        except trio.Cancelled:
+            self.cancel()
+            raise
+
+        with self._lock:
+            self._returned = True
+            results = dict(self.results)
+        return results, [name for name in self.children if name not in results]
+
+    def cancel(self):
+        """Stops the children that are still running, without reporting their results."""
+        with self._lock:
+            self._returned = True
+            self._cancelled = True
+            self.on_result = None
+            cancel_scope = self._cancel_scope
+        if cancel_scope is not None:
+            late_loop.run_sync_soon(cancel_scope.cancel)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "children": len(self.children),
+                "finished": len(self.results),
+                "late": len(self.late),
+                "failed": len(self.failed),
+                "running": self._running > 0,
+            }
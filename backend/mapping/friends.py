@@ -1,97 +1,442 @@
+import threading
+import time
+
 import api
 import trio
+from api.bases.baseuser import BaseUser, friend_sort_score
+from api.presence import PresenceType
 from api.users import User
+from api.utilities.requests import Lane, request_lane
 from .database import get_last_account
+from .games import Games
+from .joins import image_index
+from .tasks import run_call
+
+
+class PlayingNowIndex:
+    """
+    Indexes in-game users by universe and job. Each presence update moves one user, so keeping the index
+    current costs O(changed) instead of rescanning every friend.
+    """
+
+    def __init__(self):
+        # universe ID -> job ID (None if the job isn't visible) -> user IDs
+        self.universes: dict[int, dict[str, set[int]]] = {}
+        self._locations: dict[int, tuple[int, str]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, user_id: int):
+        location = self._locations.pop(user_id, None)
+        if location is None:
+            return
+        universe_id, job_id = location
+        jobs = self.universes[universe_id]
+        jobs[job_id].discard(user_id)
+        if not jobs[job_id]:
+            del jobs[job_id]
+            if not jobs:
+                del self.universes[universe_id]
+
+    def update(self, presences):
+        with self._lock:
+            for presence in presences:
+                user_id = presence.user.id
+                location = None
+                if presence.user_presence_type == PresenceType.in_game and presence.universe:
+                    location = (presence.universe.id, presence.job.id if presence.job else None)
+                if self._locations.get(user_id) == location:
+                    continue
+                self._remove(user_id)
+                if location:
+                    self._locations[user_id] = location
+                    self.universes.setdefault(location[0], {}).setdefault(location[1], set()).add(user_id)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def snapshot(self) -> dict[int, dict[str, list[int]]]:
+        with self._lock:
+            return {universe_id: {job_id: list(user_ids) for job_id, user_ids in jobs.items()}
+                    for universe_id, jobs in self.universes.items()}
+
+
+class FriendsStore:
+    """
+    The friend list of one account. It is loaded in full once, patched from FriendshipNotifications as friends
+    are added or removed and requests arrive, and reconciled in full in the background every
+    `reconcile_interval` seconds to recover from missed notifications.
+    Presence is not kept here: it is read from the client's presence store whenever the list is read.
+    """
+
+    def __init__(self, client: api.Client, user_id: int, reconcile_interval: float = 600.0):
+        self.client = client
+        self.user_id = user_id
+        self.reconcile_interval = reconcile_interval
+
+        self.friends: dict[int, BaseUser.Friends] = {}
+        self.incoming_requests: set[int] = set()
+        self.playing_now = PlayingNowIndex()
+        self.loaded_at: float = None
+        self.patches = 0
+        self.reconciles = 0
+
+        # friends added by a notification that still have to be hydrated with names
+        self._pending_ids: set[int] = set()
+        # patched from the realtime thread and read from the js_api threads
+        self._lock = threading.Lock()
+        self._reconciling = False
+
+    async def _load(self):
+        friends = await self.client.users.get_base_user(self.user_id).get_friendsv2()
+        with self._lock:
+            for user_id in self.friends.keys() - {friend.id for friend in friends}:
+                self.playing_now.remove(user_id)
+            self.friends = {friend.id: friend for friend in friends}
+            self._pending_ids -= self.friends.keys()
+            self.loaded_at = time.monotonic()
+            self.reconciles += 1
+
+    def _reconcile_in_background(self):
+        with self._lock:
+            if self._reconciling:
+                return
+            self._reconciling = True
+
+        def reconcile():
+            try:
+                with request_lane(Lane.background):
+                    trio.run(self._load)
+            except Exception as e:
+                print(f"Error reconciling friends of {self.user_id}: {e}", flush=True)
+            finally:
+                with self._lock:
+                    self._reconciling = False
+
+        threading.Thread(target=reconcile, daemon=True).start()
+
+    def add(self, user_id: int):
+        with self._lock:
+            self.incoming_requests.discard(user_id)
+            if user_id not in self.friends:
+                self._pending_ids.add(user_id)
+            self.patches += 1
+
+    def decline(self, user_id: int):
+        with self._lock:
+            self.incoming_requests.discard(user_id)
+            self.patches += 1
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self.friends.pop(user_id, None)
+            self._pending_ids.discard(user_id)
+            self.patches += 1
+        self.playing_now.remove(user_id)
+
+    def apply_notification(self, data: dict):
+        """
+        Patches the list with a FriendshipNotifications payload.
+        """
+        event_args = data.get("EventArgs") or {}
+        user_ids = {event_args.get("UserId1"), event_args.get("UserId2")}
+        user_ids.discard(self.user_id)
+        user_ids.discard(None)
+        if len(user_ids) != 1:
+            return
+        other_id = user_ids.pop()
+
+        notification_type = data.get("Type")
+        if notification_type == "FriendshipCreated":
+            self.add(other_id)
+        elif notification_type == "FriendshipDestroyed":
+            self.remove(other_id)
+        elif notification_type == "FriendshipRequested":
+            if event_args.get("UserId2") == self.user_id:
+                with self._lock:
+                    self.incoming_requests.add(other_id)
+        elif notification_type in ("FriendshipDeclined", "FriendshipRequestDeclined"):
+            self.decline(other_id)
+
+    async def get_friends(self) -> list[BaseUser.Friends]:
+        """
+        Returns every friend with their current presence, sorted by presence.
+        """
+        if self.loaded_at is None:
+            await self._load()
+        elif time.monotonic() - self.loaded_at > self.reconcile_interval:
+            self._reconcile_in_background()
+
+        with self._lock:
+            pending_ids = list(self._pending_ids)
+        if pending_ids:
+            added = await self.client.users.get_base_user(self.user_id).hydrate_friends(
+                [{"id": user_id} for user_id in pending_ids])
+            with self._lock:
+                for friend in added:
+                    if friend.id in self._pending_ids:
+                        self._pending_ids.discard(friend.id)
+                        self.friends[friend.id] = friend
+
+        with self._lock:
+            friends = list(self.friends.values())
+
+        # only presences that are stale in the presence store are requested
+        presences = await self.client.presence.get_user_presences([friend.id for friend in friends])
+        with self._lock:
+            # friend records are shared with other js_api threads reading the list
+            for presence in presences:
+                friend = self.friends.get(presence.user.id)
+                if friend:
+                    friend.presence = presence
+                    friend.sortScore = friend_sort_score(presence)
+            friends.sort(key=lambda friend: friend.sortScore, reverse=True)
+        self.playing_now.update(presences)
+        return friends
 
 
 class Friends:
-    def __init__(self, client: api.Client):
+    def __init__(self, client: api.Client, games=None):
         self.client = client
-        self.current_user_id = None
-        self.friends_raw = None
+        # the Api's Games mapping, so game cards reuse its thumbnail, icon and vote caches
+        self.games = games
+        self.stores: dict[int, FriendsStore] = {}
+        self._stores_lock = threading.Lock()
+        self.headshot_cache: dict[int, str] = {}
+        self.bust_cache: dict[int, str] = {}
+        # read for every notification and presence batch, so it isn't looked up in the database each time
+        self._active_account_id: int = None
+        client.presence.add_listener(self._handle_presences)
+        if client.websocket:
+            client.websocket.on_friendship_notifications(
+                self._handle_friendship_notifications)
+
+    def _get_store(self, user_id: int) -> FriendsStore:
+        with self._stores_lock:
+            store = self.stores.get(user_id)
+            if store is None:
+                store = self.stores[user_id] = FriendsStore(self.client, user_id)
+            return store
+
+    def _get_authed_store(self) -> FriendsStore:
+        return self._get_store(int(get_last_account().get("id")))
+
+    def _get_active_account_id(self) -> int:
+        if self._active_account_id is None:
+            account = get_last_account()
+            self._active_account_id = int(account["id"]) if account else None
+        return self._active_account_id
 
-    def get_authed_friends(self, iterate: tuple = (0, 15)):
+    def set_active_account(self, account_id: int = None):
+        """Called when the active account changes. None makes the next lookup read it from the database."""
+        self._active_account_id = int(account_id) if account_id is not None else None
+
+    def _handle_friendship_notifications(self, data: dict):
+        account_id = self._get_active_account_id()
+        if account_id is not None:
+            self.apply_notification(account_id, data)
+
+    def _handle_presences(self, presences: list):
+        # keeps the active account's playing-now index current as presences are refetched
+        account_id = self._get_active_account_id()
+        store = self.stores.get(account_id) if account_id is not None else None
+        if store and store.loaded_at is not None:
+            store.playing_now.update(
+                [presence for presence in presences if presence.user.id in store.friends])
+
+    def apply_notification(self, account_id: int, data: dict):
+        """Routes a FriendshipNotifications payload to the friend list of the account that received it."""
+        store = self.stores.get(account_id)
+        # nothing to patch until the list has been loaded once
+        if store and store.loaded_at is not None:
+            store.apply_notification(data)
+
+    def get_incoming_friend_requests(self):
+        return sorted(self._get_authed_store().incoming_requests)
+
+    async def _get_images(self, user_ids: list, cache: dict, thumbnail_type: api.AvatarThumbnailType, size: tuple) -> dict:
+        """Returns image URLs for the passed users, only requesting the ones that aren't cached yet."""
+        missing_ids = [user_id for user_id in user_ids if user_id not in cache]
+        if missing_ids:
+            thumbnails = await self.client.thumbnails.get_user_avatar_thumbnails(
+                missing_ids, thumbnail_type, size, image_format=api.ThumbnailFormat.webp)
+            # pending thumbnails have no URL yet and are requested again next time
+            cache.update((user_id, url) for user_id, url in image_index(thumbnails).items() if url)
+        return {user_id: cache.get(user_id, "") for user_id in user_ids}
+
+    async def _get_headshots(self, user_ids: list) -> dict:
+        return await self._get_images(user_ids, self.headshot_cache, api.AvatarThumbnailType.headshot, (100, 100))
+
+    async def _get_busts(self, user_ids: list) -> dict:
+        return await self._get_images(user_ids, self.bust_cache, api.AvatarThumbnailType.full_body, (420, 420))
+
+    def _friend_row(self, friend, image: str) -> dict:
+        # Safely extract presence data
+        presence_type = "offline"
+        root_place_id = None
+        universe_id = None
+        job_id = None
+        last_location = None
+
+        if friend.presence:
+            presence_type = friend.presence.user_presence_type.name
+            root_place_id = friend.presence.root_place.id if friend.presence.root_place else None
+            universe_id = friend.presence.universe.id if friend.presence.universe else None
+            job_id = friend.presence.job.id if friend.presence.job else None
+            last_location = friend.presence.last_location
+
+        return {
+            "id": friend.id,
+            "name": friend.name,
+            "displayName": friend.displayName,
+            "presence": {
+                "type": presence_type,
+                "place": root_place_id,
+                "universe": universe_id,
+                "job": job_id,
+                "lastLocation": last_location
+            },
+            "friendStatus": "Friends",
+            "image": image,
+        }
+
+    def get_authed_friends(self, iterate: tuple = (0, 15), include_bust: bool = True):
         async def fetch():
-            id = int(get_last_account().get("id"))
-            if self.current_user_id != id or not self.friends_raw:
-                self.current_user_id = id
-                self.friends_raw = await self.client.users.get_base_user(id).get_friendsv2()
-            friends_data = self.friends_raw[iterate[0]:min(
-                iterate[1], len(self.friends_raw))]
+            friends_raw = await self._get_authed_store().get_friends()
+            friends_data = friends_raw[iterate[0]:min(
+                iterate[1], len(friends_raw))]
             friends_ids = [friend.id for friend in friends_data]
 
-            friends = []
-            images_headshot = []
-            images_bust = []
+            headshots = {}
+            busts = {}
 
             async def fetch_images_headshot():
-                nonlocal images_headshot
-                images_headshot = await self.client.thumbnails.get_user_avatar_thumbnails(
-                    friends_ids, api.AvatarThumbnailType.headshot, (100, 100), image_format=api.ThumbnailFormat.webp)
+                headshots.update(await self._get_headshots(friends_ids))
 
             async def fetch_images_bust():
-                nonlocal images_bust
-                images_bust = await self.client.thumbnails.get_user_avatar_thumbnails(
-                    friends_ids, api.AvatarThumbnailType.full_body, (420, 420), image_format=api.ThumbnailFormat.webp)
+                busts.update(await self._get_busts(friends_ids))
 
             async with trio.open_nursery() as nursery:
                 nursery.start_soon(fetch_images_headshot)
-                nursery.start_soon(fetch_images_bust)
+                if include_bust:
+                    nursery.start_soon(fetch_images_bust)
 
+            friends = []
             for friend in friends_data:
-                # Safely extract presence data
-                presence_type = "offline"
-                root_place_id = None
-                universe_id = None
-                job_id = None
-                last_location = None
-
-                if friend.presence:
-                    presence_type = friend.presence.user_presence_type.name
-                    place_id = friend.presence.place.id if friend.presence.place else None
-                    root_place_id = friend.presence.root_place.id if friend.presence.root_place else None
-                    universe_id = friend.presence.universe.id if friend.presence.universe else None
-                    job_id = friend.presence.job.id if friend.presence.job else None
-                    last_location = friend.presence.last_location
-
-                friends.append({
-                    "id": friend.id,
-                    "name": friend.name,
-                    "displayName": friend.displayName,
-                    "presence": {
-                        "type": presence_type,
-                        "place": root_place_id,
-                        "universe": universe_id,
-                        "job": job_id,
-                        "lastLocation": last_location
-                    },
-                    "friendStatus": "Friends",
-                    "image": next(image.image_url for image in images_headshot if image.target_id == friend.id),
-                    "imageBust": next(image.image_url for image in images_bust if image.target_id == friend.id)
-                })
+                row = self._friend_row(friend, headshots.get(friend.id, ""))
+                if include_bust:
+                    row["imageBust"] = busts.get(friend.id, "")
+                friends.append(row)
             return friends
 
-        return trio.run(fetch)
+        return run_call(fetch)
+
+    def _prefetch_headshots(self, user_ids: list):
+        user_ids = [user_id for user_id in user_ids if user_id not in self.headshot_cache]
+        if not user_ids:
+            return
+
+        def prefetch():
+            try:
+                with request_lane(Lane.prefetch):
+                    trio.run(self._get_headshots, user_ids)
+            except Exception as e:
+                print(f"Error prefetching headshots: {e}", flush=True)
+
+        threading.Thread(target=prefetch, daemon=True).start()
+
+    def get_friends_window(self, start: int = 0, count: int = 30, prefetch: bool = True):
+        """
+        Returns lightweight rows (names, presence and headshot) for the friends in [start, start + count),
+        plus the total friend count. Full-body images are left to `get_friend_busts`. Headshots of the
+        following window are prefetched in the background so scrolling doesn't wait on them.
+        """
+        async def fetch():
+            friends_raw = await self._get_authed_store().get_friends()
+            friends_data = friends_raw[start:start + count]
+            headshots = await self._get_headshots([friend.id for friend in friends_data])
+
+            if prefetch:
+                self._prefetch_headshots(
+                    [friend.id for friend in friends_raw[start + count:start + 2 * count]])
+
+            return {
+                "start": start,
+                "total": len(friends_raw),
+                "friends": [self._friend_row(friend, headshots.get(friend.id, "")) for friend in friends_data],
+            }
+
+        return run_call(fetch)
+
+    def get_friend_busts(self, user_ids: list):
+        """Returns full-body image URLs, keyed by user ID, for the rows that are in view or hovered."""
+        return run_call(self._get_busts, user_ids)
+
+    def get_playing_now(self):
+        """
+        Returns a card for every game friends are playing, with the friends in it grouped by server,
+        sorted by how many friends are playing.
+        """
+        async def fetch():
+            store = self._get_authed_store()
+            if store.loaded_at is None:
+                await store.get_friends()
+            playing = store.playing_now.snapshot()
+            if not playing:
+                return []
+
+            universes = await self.client.universes.get_universes(list(playing))
+            games_mapping = self.games() if self.games else Games(self.client)
+            cards = await games_mapping._get_page_items(universes)
+
+            friend_ids = [user_id for jobs in playing.values() for user_ids in jobs.values() for user_id in user_ids]
+            headshots = await self._get_headshots(friend_ids)
+
+            results = []
+            for card in cards:
+                jobs = playing.get(card["id"], {})
+                friends = [
+                    self._friend_row(store.friends[user_id], headshots.get(user_id, ""))
+                    for user_ids in jobs.values() for user_id in user_ids if user_id in store.friends
+                ]
+                results.append({
+                    "game": card,
+                    "friends": friends,
+                    "servers": [{"jobId": job_id, "friendIds": user_ids} for job_id, user_ids in jobs.items()],
+                })
+            results.sort(key=lambda result: len(result["friends"]), reverse=True)
+            return results
+
+        return run_call(fetch)
 
     def send_friend_request(self, user_id: int):
         async def fetch():
             return await self.client.users.get_base_user(user_id).send_friend_request()
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def remove_friend(self, user_id: int):
         async def fetch():
-            return await self.client.users.get_base_user(user_id).remove_friend()
-        return trio.run(fetch)
+            result = await self.client.users.get_base_user(user_id).remove_friend()
+            if result:
+                self._get_authed_store().remove(user_id)
+            return result
+        return run_call(fetch)
 
     def accept_friend_request(self, user_id: int):
         async def fetch():
-            return await self.client.users.get_base_user(user_id).accept_friend_request()
+            result = await self.client.users.get_base_user(user_id).accept_friend_request()
+            if result:
+                self._get_authed_store().add(user_id)
+            return result
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def decline_friend_request(self, user_id: int):
         async def fetch():
-            return await self.client.users.get_base_user(user_id).decline_friend_request()
+            result = await self.client.users.get_base_user(user_id).decline_friend_request()
+            if result:
+                self._get_authed_store().decline(user_id)
+            return result
 
-        return trio.run(fetch)
+        return run_call(fetch)
@@ -1,9 +1,26 @@
+from collections import OrderedDict
+
 import api
 import httpx
 import trio
 from api.jobs import PrivateServer, ServerType
 from api.utilities.exceptions import NoMoreItems
+from api.utilities.iterators import OmniPageIterator
 from .database import get_last_account
+from .events import event_bus
+from .fanout import FanOut
+from .joins import index_by
+from .servers import PrivateServerPages, ServerBrowser, ServerFinder
+from .tasks import request_slots, run_call
+
+# How many places / search queries keep their iterators (and recorded cursors) around
+ITERATOR_CACHE_SIZE = 5
+SERVER_PAGE_CACHE_SIZE = 20
+SERVER_PAGE_CACHE_MAX_AGE = 30.0
+SEARCH_PAGE_CACHE_SIZE = 10
+SEARCH_PAGE_CACHE_MAX_AGE = 300.0
+# How long a page of games waits for thumbnails, icons, votes and playability before returning without them
+PAGE_ITEMS_BUDGET = 2.0
 
 
 class Games:
@@ -18,11 +35,16 @@ class Games:
         self.avatar_cache = {}
         self.friend_servers_iterator = None
         self.public_servers_iterator = None
-        self.private_servers_iterator = None
+        self.private_servers: dict[tuple[int, int], PrivateServerPages] = {}
+        self.private_servers_current: PrivateServerPages = None
         self.search_iterator = None
+        self.server_iterators: OrderedDict[tuple[int, int], tuple] = OrderedDict()
+        self.search_iterators: OrderedDict[str, OmniPageIterator] = OrderedDict()
         self.search_query = None
         self.public_current_place_id = None
         self.private_current_place_id = None
+        self.server_browser = ServerBrowser(client)
+        self.server_finder = ServerFinder(client, self.avatar_cache)
 
     def _check_user_changed(self):
         current_user = get_last_account().get("id")
@@ -46,14 +68,8 @@ class Games:
         icons_to_fetch = [
             uid for uid in current_page_ids if uid not in self.icon_cache]
 
-        thumbnails = []
-        icons = []
-        votes = []
-        playability = []
-
         # Fetch only uncached thumbnails
         async def fetch_thumbnails():
-            nonlocal thumbnails
             if thumbnails_to_fetch:
                 thumbnails = await self.client.thumbnails.get_universe_thumbnails(
                     universes=thumbnails_to_fetch,
@@ -62,16 +78,16 @@ class Games:
                     image_format=api.ThumbnailFormat.webp,
                 )
 
+                # collected first so other calls never see a universe with only some of its thumbnails
+                fetched = {}
                 for thumbnails_list in thumbnails:
-                    if thumbnails_list.universe_id not in self.thumbnail_cache:
-                        self.thumbnail_cache[thumbnails_list.universe_id] = []
-                    self.thumbnail_cache[thumbnails_list.universe_id].extend(
+                    fetched.setdefault(thumbnails_list.universe_id, []).extend(
                         thumbnails_list.thumbnails
                     )
+                self.thumbnail_cache.update(fetched)
 
         # Fetch only uncached icons
         async def fetch_icons():
-            nonlocal icons
             if icons_to_fetch:
                 icons = await self.client.thumbnails.get_universe_icons(
                     universes=icons_to_fetch,
@@ -83,20 +99,30 @@ class Games:
                     self.icon_cache[icon.target_id] = icon.image_url
 
         async def fetch_votes():
-            nonlocal votes
-            votes = await self.client.universes.get_votes(current_page_ids)
+            return index_by(await self.client.universes.get_votes(current_page_ids))
 
         async def fetch_playability():
-            nonlocal playability
-            playability = await self.client.universes.get_playability(current_page_ids)
-
-        async with trio.open_nursery() as nursery:
-            nursery.start_soon(fetch_thumbnails)
-            nursery.start_soon(fetch_icons)
-            nursery.start_soon(fetch_votes)
-            nursery.start_soon(fetch_playability)
-
-        playability_map = {item["universe_id"]: item for item in playability}
+            return index_by(await self.client.universes.get_playability(current_page_ids), "universe_id")
+
+        def send_late(name: str, result, late: bool):
+            # rows were already returned without this part, so it follows as an update
+            if late:
+                event_bus.emit("gamesUpdate", [
+                    {"id": universe_id, **fields} for universe_id, fields in self._page_item_fields(
+                        name, result, current_page_ids).items()])
+
+        fan_out = FanOut({
+            "thumbnailUrl": fetch_thumbnails,
+            "iconUrl": fetch_icons,
+            "votes": fetch_votes,
+            "playability": fetch_playability,
+        }, PAGE_ITEMS_BUDGET, on_result=send_late)
+        results, missing = await fan_out.run()
+
+        playability_map = results.get("playability", {})
+        votes_map = results.get("votes", {})
+        no_votes = self.client.universes.Votes(0, 0, 0)
+        unknown_playability = {"is_playable": None, "playability_status": None}
         # Use cached thumbnail_map
         thumbnail_map = self.thumbnail_cache
 
@@ -132,16 +158,35 @@ class Games:
                 "isAllGenre": item.is_all_genre,
                 "isFavoritedByUser": item.is_favorited_by_user,
                 "favoritedCount": item.favorited_count,
-                "upvotes": votes[current_page_ids.index(item.id)].upVotes,
-                "downvotes": votes[current_page_ids.index(item.id)].downVotes,
+                "upvotes": votes_map.get(item.id, no_votes).upVotes,
+                "downvotes": votes_map.get(item.id, no_votes).downVotes,
                 "playability": {
-                    "isPlayable": playability_map[item.id]["is_playable"],
-                    "playabilityStatus": playability_map[item.id]["playability_status"],
+                    "isPlayable": playability_map.get(item.id, unknown_playability)["is_playable"],
+                    "playabilityStatus": playability_map.get(item.id, unknown_playability)["playability_status"],
                 },
+                "missing": missing,
             }
             for item in collection
         ]
 
+    def _page_item_fields(self, name: str, result, universe_ids: list) -> dict:
+        """
+        Returns the row fields filled by one part of `_get_page_items`, by universe ID.
+        """
+        if name == "thumbnailUrl":
+            return {universe_id: {"thumbnailUrl": [thumb.image_url for thumb in self.thumbnail_cache[universe_id]]}
+                    for universe_id in universe_ids if universe_id in self.thumbnail_cache}
+        if name == "iconUrl":
+            return {universe_id: {"iconUrl": self.icon_cache[universe_id]}
+                    for universe_id in universe_ids if universe_id in self.icon_cache}
+        if name == "votes":
+            return {universe_id: {"upvotes": votes.upVotes, "downvotes": votes.downVotes}
+                    for universe_id, votes in result.items()}
+        return {universe_id: {"playability": {
+            "isPlayable": playability["is_playable"],
+            "playabilityStatus": playability["playability_status"],
+        }} for universe_id, playability in result.items()}
+
     def get_authed_recommendations(self, max_per_page: int = 12):
         async def fetch():
             self._check_user_changed()
@@ -172,14 +217,14 @@ class Games:
                         f"Connection timeout after {max_retries} attempts: {e}"
                     )
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_authed_recommendations_page(self, page: int):
         async def fetch():
             page_data = await self.authed_recommendations.get_page(page)
             return await self._get_page_items(page_data)
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_authed_continue(self, max_per_page: int = 12):
         async def fetch():
@@ -211,14 +256,14 @@ class Games:
                         f"Connection timeout after {max_retries} attempts: {e}"
                     )
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_authed_continue_page(self, page: int):
         async def fetch():
             page_data = await self.authed_continue.get_page(page)
             return await self._get_page_items(page_data)
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_authed_favorites(self, max_per_page: int = 24):
         async def fetch():
@@ -250,14 +295,14 @@ class Games:
                         f"Connection timeout after {max_retries} attempts: {e}"
                     )
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_authed_favorites_page(self, page: int):
         async def fetch():
             page_data = await self.authed_favorites.get_page(page)
             return await self._get_page_items(page_data)
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     async def _process_servers(self, servers):
         """Helper method to process server data and fetch avatars."""
@@ -268,10 +313,13 @@ class Games:
             all_tokens.update(
                 [token.player_token for token in server.players if server.players]
             )
+        await self._fetch_avatars(all_tokens)
 
+    async def _fetch_avatars(self, tokens):
+        """Resolves player tokens to headshot URLs, skipping tokens already cached."""
         # Check which avatars need to be fetched
         tokens_to_fetch = [
-            token for token in all_tokens if token not in self.avatar_cache
+            token for token in tokens if token not in self.avatar_cache
         ]
 
         # Fetch only uncached avatars
@@ -288,240 +336,269 @@ class Games:
                     token = request_parts[1]
                     self.avatar_cache[token] = avatar.image_url
 
-    def get_servers(self, id: int, page_size: int = 10):
-        async def fetch():
-            # Always reinitialize iterators for a new place to avoid lock issues
-            # if self.public_current_place_id != id:
-            #     self.public_current_place_id = id
-            #     self.friend_servers_iterator = None
-            #     self.public_servers_iterator = None
-
-            # # Initialize iterators if not initialized
-            # if not self.friend_servers_iterator or not self.public_servers_iterator:
+    def _get_server_iterators(self, id: int, page_size: int):
+        """Returns the friend/public server iterators for a place, reusing the ones from an earlier visit."""
+        key = (id, page_size)
+        iterators = self.server_iterators.get(key)
+        if iterators:
+            self.server_iterators.move_to_end(key)
+            for iterator in iterators:
+                iterator.restart()
+        else:
             baseplace = self.client.places.get_base_place(id)
-            self.friend_servers_iterator = baseplace.get_servers(
-                server_type=ServerType.friend, page_size=page_size
-            )
-            self.public_servers_iterator = baseplace.get_servers(
-                server_type=ServerType.public, page_size=page_size
+            iterators = (
+                baseplace.get_servers(
+                    server_type=ServerType.friend, page_size=page_size),
+                baseplace.get_servers(
+                    server_type=ServerType.public, page_size=page_size),
             )
+            for iterator in iterators:
+                iterator.page_cache_size = SERVER_PAGE_CACHE_SIZE
+                iterator.page_cache_max_age = SERVER_PAGE_CACHE_MAX_AGE
+            self.server_iterators[key] = iterators
+            while len(self.server_iterators) > ITERATOR_CACHE_SIZE:
+                self.server_iterators.popitem(last=False)
+        return iterators
+
+    async def _get_servers_page(self, page: int = None):
+        """
+        Fetches a page from both the friend and public server iterators, either the next page or,
+        when `page` (0-based) is passed, that page directly.
+        """
+        friend_servers = []
+        public_servers = []
+        next_cursor = ""
+
+        async def get_friend_servers():
+            nonlocal friend_servers
+            try:
+                friend_servers = await (
+                    self.friend_servers_iterator.next() if page is None
+                    else self.friend_servers_iterator.get_page_at(page)
+                )
+            except NoMoreItems:
+                pass
+            except Exception as e:
+                print(f"Friend servers error: {e}", flush=True)
 
-            # Fetch first page from both iterators
-            friend_servers = []
-            public_servers = []
-            next_cursor = ""
+        async def get_public_servers():
+            nonlocal public_servers, next_cursor
+            try:
+                public_servers = await (
+                    self.public_servers_iterator.next() if page is None
+                    else self.public_servers_iterator.get_page_at(page)
+                )
+                next_cursor = self.public_servers_iterator.next_cursor
+            except NoMoreItems:
+                pass
+            except Exception as e:
+                print(f"Public servers error: {e}", flush=True)
 
-            async def get_friend_servers():
-                nonlocal friend_servers
-                try:
-                    friend_servers = await self.friend_servers_iterator.next()
-                except NoMoreItems:
-                    pass
-                except Exception as e:
-                    print(f"Friend servers error: {e}", flush=True)
-
-            async def get_public_servers():
-                nonlocal public_servers, next_cursor
-                try:
-                    public_servers = await self.public_servers_iterator.next()
-                    next_cursor = self.public_servers_iterator.next_cursor
-                except NoMoreItems:
-                    pass
-                except Exception as e:
-                    print(f"Public servers error: {e}", flush=True)
-
-            # --- Concurrency using Trio Nursery ---
-            async with trio.open_nursery() as nursery:
-                nursery.start_soon(get_friend_servers)
-                nursery.start_soon(get_public_servers)
-
-            # Merge servers with friend servers first, removing duplicates
-            seen_ids = set()
-            all_servers = []
-            for server in friend_servers + public_servers:
-                if server.id not in seen_ids:
-                    seen_ids.add(server.id)
-                    all_servers.append(server)
-            await self._process_servers(all_servers)
-
-            return [
-                {
-                    "id": server.id,
-                    "maxPlayers": server.max_players,
-                    "playing": server.playing,
-                    "playerTokens": server.player_tokens,
-                    "playerAvatars": [
-                        self.avatar_cache.get(token, "")
-                        for token in server.player_tokens
-                    ],
-                    "fps": server.fps,
-                    "ping": server.ping,
-                    "nextCursor": next_cursor,
-                }
-                for server in all_servers
-            ]
+        # --- Concurrency using Trio Nursery ---
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(get_friend_servers)
+            nursery.start_soon(get_public_servers)
+
+        # Merge servers with friend servers first, removing duplicates
+        seen_ids = set()
+        all_servers = []
+        for server in friend_servers + public_servers:
+            if server.id not in seen_ids:
+                seen_ids.add(server.id)
+                all_servers.append(server)
+        await self._process_servers(all_servers)
 
-        return trio.run(fetch)
+        return [
+            {
+                "id": server.id,
+                "maxPlayers": server.max_players,
+                "playing": server.playing,
+                "playerTokens": server.player_tokens,
+                "playerAvatars": [
+                    self.avatar_cache.get(token, "")
+                    for token in server.player_tokens
+                ],
+                "fps": server.fps,
+                "ping": server.ping,
+                "nextCursor": next_cursor or "",
+            }
+            for server in all_servers
+        ]
 
-    def get_servers_next_page(self):
+    def get_servers(self, id: int, page_size: int = 10, view: str = None):
+        async def fetch():
+            # Iterators are kept per place, so reopening a place starts from its recorded cursors
+            self.friend_servers_iterator, self.public_servers_iterator = self._get_server_iterators(
+                id, page_size)
+            return await self._get_servers_page()
+
+        # switching places cancels the servers request of the place that was left
+        return request_slots.run("servers", fetch, view=view, cancelled_result=[])
+
+    def get_servers_next_page(self, view: str = None):
         async def fetch():
             if not self.friend_servers_iterator or not self.public_servers_iterator:
                 raise ValueError(
                     "Iterators not initialized. Call get_servers first.")
+            return await self._get_servers_page()
 
-            # Fetch next page from both iterators
-            friend_servers = []
-            public_servers = []
-            next_cursor = ""
+        return request_slots.run("servers", fetch, view=view, cancelled_result=[])
 
-            try:
-                friend_servers = await self.friend_servers_iterator.next()
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Friend servers next page error: {e}", flush=True)
+    def get_servers_page(self, page: int, view: str = None):
+        """Returns a page (1-based) of the current place's servers, using the recorded cursors for visited pages."""
+        async def fetch():
+            if not self.friend_servers_iterator or not self.public_servers_iterator:
+                raise ValueError(
+                    "Iterators not initialized. Call get_servers first.")
+            return await self._get_servers_page(page - 1)
 
-            try:
-                public_servers = await self.public_servers_iterator.next()
-                next_cursor = self.public_servers_iterator.next_cursor
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Public servers next page error: {e}", flush=True)
-
-            # Merge servers, removing duplicates
-            seen_ids = set()
-            all_servers = []
-            for server in friend_servers + public_servers:
-                if server.id not in seen_ids:
-                    seen_ids.add(server.id)
-                    all_servers.append(server)
-
-            await self._process_servers(all_servers)
-
-            return [
-                {
-                    "id": server.id,
-                    "maxPlayers": server.max_players,
-                    "playing": server.playing,
-                    "playerTokens": server.player_tokens,
-                    "playerAvatars": [
-                        self.avatar_cache.get(token, "")
-                        for token in server.player_tokens
-                    ],
-                    "fps": server.fps,
-                    "ping": server.ping,
-                    "nextCursor": next_cursor,
-                }
-                for server in all_servers
-            ]
+        return request_slots.run("servers", fetch, view=view, cancelled_result=[])
+
+    def _format_private_servers(self, servers: list[PrivateServer], next_cursor: str):
+        return [
+            {
+                "id": server.vip_server_id,
+                "maxPlayers": server.max_players,
+                "playing": server.playing,
+                "playerTokens": server.player_tokens,
+                "playerAvatars": [
+                    self.avatar_cache.get(token, "")
+                    for token in server.player_tokens
+                ],
+                "fps": server.fps,
+                "ping": server.ping,
+                "name": server.name,
+                "accessCode": server.access_code,
+                "owner": {
+                    "id": server.owner.id,
+                    "name": server.owner.name,
+                    "displayName": server.owner.display_name,
+                },
+                "nextCursor": next_cursor or "",
+            }
+            for server in servers
+        ]
 
-        return trio.run(fetch)
+    async def _get_private_servers_page(self, page: int, refresh: bool):
+        private_servers = self.private_servers_current
+        servers: list[PrivateServer] = []
+        try:
+            servers = await private_servers.get_page(page, refresh)
+            private_servers.position = page
+        except NoMoreItems:
+            pass
+        except Exception as e:
+            print(f"Private servers error: {e}", flush=True)
+
+        await self._process_servers(servers)
+        return self._format_private_servers(servers, private_servers.next_cursor(page))
 
     def get_servers_private(self, id: int, page_size: int = 10):
         async def fetch():
-            # # Always reinitialize iterator for a new place to avoid lock issues
-            # if self.private_current_place_id != id:
-            #     self.private_current_place_id = id
-            #     self.private_servers_iterator = None
+            # Private servers are cached per place and account; reopening only refreshes volatile fields
+            key = (id, get_last_account().get("id"))
+            private_servers = self.private_servers.get(key)
+            if not private_servers or private_servers.page_size != page_size:
+                baseplace = self.client.places.get_base_place(id)
+                private_servers = PrivateServerPages(
+                    id, page_size, baseplace.get_private_servers(
+                        page_size=page_size)
+                )
+                self.private_servers[key] = private_servers
+            self.private_servers_current = private_servers
 
-            # Initialize iterator if not initialized
-            # if not self.private_servers_iterator:
-            baseplace = self.client.places.get_base_place(id)
-            self.private_servers_iterator = baseplace.get_private_servers(
-                page_size=page_size
-            )
+            return await self._get_private_servers_page(0, refresh=True)
 
-            # Fetch first page
-            servers: list[PrivateServer] = []
-            next_cursor = ""
-            try:
-                servers = await self.private_servers_iterator.next()
-                next_cursor = self.private_servers_iterator.next_cursor
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Private servers error: {e}", flush=True)
-
-            await self._process_servers(servers)
-
-            return [
-                {
-                    "id": server.vip_server_id,
-                    "maxPlayers": server.max_players,
-                    "playing": server.playing,
-                    "playerTokens": server.player_tokens,
-                    "playerAvatars": [
-                        self.avatar_cache.get(token, "")
-                        for token in server.player_tokens
-                    ],
-                    "fps": server.fps,
-                    "ping": server.ping,
-                    "name": server.name,
-                    "accessCode": server.access_code,
-                    "owner": {
-                        "id": server.owner.id,
-                        "name": server.owner.name,
-                        "displayName": server.owner.display_name,
-                    },
-                    "nextCursor": next_cursor,
-                }
-                for server in servers
-            ]
-
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_servers_private_next_page(self):
         async def fetch():
-            if not self.private_servers_iterator:
+            if not self.private_servers_current:
                 raise ValueError(
                     "Iterator not initialized. Call get_servers_private first."
                 )
+            return await self._get_private_servers_page(
+                self.private_servers_current.position + 1, refresh=True)
 
-            # Fetch next page
-            servers: list[PrivateServer] = []
-            next_cursor = ""
-            try:
-                servers = await self.private_servers_iterator.next()
-                next_cursor = self.private_servers_iterator.next_cursor
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Private servers next page error: {e}", flush=True)
-
-            await self._process_servers(servers)
-
-            return [
-                {
-                    "id": server.vip_server_id,
-                    "maxPlayers": server.max_players,
-                    "playing": server.playing,
-                    "playerTokens": server.player_tokens,
-                    "playerAvatars": [
-                        self.avatar_cache.get(token, "")
-                        for token in server.player_tokens
-                    ],
-                    "fps": server.fps,
-                    "ping": server.ping,
-                    "name": server.name,
-                    "accessCode": server.access_code,
-                    "owner": {
-                        "id": server.owner.id,
-                        "name": server.owner.name,
-                        "displayName": server.owner.display_name,
-                    },
-                    "nextCursor": next_cursor,
-                }
-                for server in servers
-            ]
+        return run_call(fetch)
+
+    def get_servers_private_page(self, page: int):
+        """
+        Returns a page (1-based). Visited pages come from the cache without refetching, later pages are fetched
+        by walking forward from the last visited one.
+        """
+        async def fetch():
+            if not self.private_servers_current:
+                raise ValueError(
+                    "Iterator not initialized. Call get_servers_private first."
+                )
+            return await self._get_private_servers_page(page - 1, refresh=False)
+
+        return run_call(fetch)
+
+    def scan_servers(self, id: int, refresh: bool = False):
+        """
+        Starts streaming every public server of a place into the server browser index.
+        Progress arrives as `serverScanPage` / `serverScanComplete` events; returns the current stats.
+        """
+        return self.server_browser.start(id, refresh)
+
+    def stop_server_scan(self, id: int):
+        self.server_browser.stop(id)
+
+    def query_servers(self, id: int, sort: str = "playing", descending: bool = True, filters: dict = None, page: int = 1, page_size: int = 10):
+        async def fetch():
+            index = self.server_browser.get_index(id)
+            servers, total = index.query(
+                sort=sort,
+                descending=descending,
+                filters=filters,
+                offset=(page - 1) * page_size,
+                limit=page_size,
+            )
+            await self._fetch_avatars(
+                {token for server in servers for token in server["playerTokens"]})
+
+            for server in servers:
+                server["playerAvatars"] = [
+                    self.avatar_cache.get(token, "")
+                    for token in server["playerTokens"]
+                ]
+            return {
+                "servers": servers,
+                "total": total,
+                "stats": index.stats(),
+            }
+
+        return run_call(fetch)
+
+    def find_user_server(self, id: int, user_id: int = None, image_url: str = None):
+        """
+        Scans every public server of a place for the given user and returns the server they are in.
+        The user is matched by headshot URL; pass `image_url` directly or a `user_id` to look it up.
+        """
+        async def fetch():
+            target_url = image_url
+            if not target_url:
+                # Must match the size/format used when resolving player tokens
+                images = await self.client.thumbnails.get_user_avatar_thumbnails(
+                    [user_id], api.AvatarThumbnailType.headshot, (48, 48), image_format=api.ThumbnailFormat.webp
+                )
+                target_url = images[0].image_url if images else None
+            if not target_url:
+                raise ValueError("Could not resolve the user's headshot.")
+            return await self.server_finder.find(id, target_url)
+
+        return run_call(fetch)
 
-        return trio.run(fetch)
+    def cancel_find_user_server(self, id: int):
+        self.server_finder.cancel(id)
 
     def set_favorite(self, universe_id: int, favorite: bool):
         async def fetch():
             await self.client.universes.set_favorite(universe_id, favorite)
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def get_vote_status(self, universe_id: int):
         async def fetch():
@@ -532,90 +609,100 @@ class Games:
                 "reason": vote_status.reason,
             }
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
     def set_vote(self, universe_id: int, vote: bool):
         async def fetch():
             await self.client.universes.set_vote(universe_id, vote)
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
-    def search_universes(self, query: str):
-        async def fetch():
-            self.search_query = query
-            self.search_iterator = self.client.universes.search_universes(
-                query)
-
-            items: list[dict] = []
-            next_cursor = ""
-            try:
-                items = await self.search_iterator.next()
-                next_cursor = self.search_iterator.next_cursor
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Private servers next page error: {e}", flush=True)
-
-            async def get_universes():
-                universe_ids = [
-                    content["universeId"]
-                    for result in items
-                    for content in (
-                        result["contents"]
-                        if isinstance(result["contents"], list)
-                        else [result["contents"]]
-                    )
-                ]
-                universes_data = await self.client.universes.get_universes(
-                    universe_ids=universe_ids
+    async def _search_universes_page(self, page: int = None):
+        items: list[dict] = []
+        next_cursor = ""
+        try:
+            items = await (
+                self.search_iterator.next() if page is None
+                else self.search_iterator.get_page_at(page)
+            )
+            next_cursor = self.search_iterator.next_cursor
+        except NoMoreItems:
+            pass
+        except Exception as e:
+            print(f"Search universes error: {e}", flush=True)
+
+        async def get_universes():
+            universe_ids = [
+                content["universeId"]
+                for result in items
+                for content in (
+                    result["contents"]
+                    if isinstance(result["contents"], list)
+                    else [result["contents"]]
                 )
-                return universes_data
-
-            return [next_cursor, await self._get_page_items(await get_universes())]
+            ]
+            universes_data = await self.client.universes.get_universes(
+                universe_ids=universe_ids
+            )
+            return universes_data
 
-        return trio.run(fetch)
+        return [next_cursor or "", await self._get_page_items(await get_universes())]
 
-    def search_universes_next_page(self):
+    def search_universes(self, query: str, view: str = None):
+        async def fetch():
+            self.search_query = query
+            # Iterators are kept per query, so repeating a search starts from its recorded cursors
+            self.search_iterator = self.search_iterators.get(query)
+            if self.search_iterator:
+                self.search_iterators.move_to_end(query)
+                self.search_iterator.restart()
+            else:
+                self.search_iterator = self.client.universes.search_universes(
+                    query)
+                self.search_iterator.page_cache_size = SEARCH_PAGE_CACHE_SIZE
+                self.search_iterator.page_cache_max_age = SEARCH_PAGE_CACHE_MAX_AGE
+                self.search_iterators[query] = self.search_iterator
+                while len(self.search_iterators) > ITERATOR_CACHE_SIZE:
+                    self.search_iterators.popitem(last=False)
+
+            return await self._search_universes_page()
+
+        # each keystroke cancels the search of the previous one
+        return request_slots.run("search_universes", fetch, view=view, cancelled_result=["", []])
+
+    def search_universes_next_page(self, view: str = None):
         async def fetch():
             if not self.search_iterator:
                 raise ValueError(
                     "Iterator not initialized. Call search_universes first."
                 )
+            return await self._search_universes_page()
 
-            items: list[dict] = []
-            next_cursor = ""
-            try:
-                items = await self.search_iterator.next()
-                next_cursor = self.search_iterator.next_cursor
-            except NoMoreItems:
-                pass
-            except Exception as e:
-                print(f"Private servers next page error: {e}", flush=True)
-
-            async def get_universes():
-                universe_ids = [
-                    content["universeId"]
-                    for result in items
-                    for content in (
-                        result["contents"]
-                        if isinstance(result["contents"], list)
-                        else [result["contents"]]
-                    )
-                ]
-                universes_data = await self.client.universes.get_universes(
-                    universe_ids=universe_ids
-                )
-                return universes_data
+        return request_slots.run("search_universes", fetch, view=view, cancelled_result=["", []])
 
-            return [next_cursor, await self._get_page_items(await get_universes())]
+    def search_universes_page(self, page: int, view: str = None):
+        """Returns a page (1-based) of the current search, using the recorded cursors for visited pages."""
+        async def fetch():
+            if not self.search_iterator:
+                raise ValueError(
+                    "Iterator not initialized. Call search_universes first."
+                )
+            return await self._search_universes_page(page - 1)
 
-        return trio.run(fetch)
+        return request_slots.run("search_universes", fetch, view=view, cancelled_result=["", []])
 
-    def search_suggestions(self, query: str):
+    def search_suggestions(self, query: str, view: str = None):
         async def fetch():
             suggestions = await self.client.universes.search_suggestions(
                 query=query,
             )
             return suggestions
 
-        return trio.run(fetch)
+        return request_slots.run("search_suggestions", fetch, view=view, cancelled_result=[])
+
+    def get_request_metrics(self):
+        """
+        Returns how many js_api requests were superseded and cancelled, and how long they had run, along with
+        the request count, delays and p50/p95 latency of each priority lane.
+        """
+        return {**request_slots.stats(), "lanes": self.client.requests.scheduler.stats()}
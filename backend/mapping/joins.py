@@ -0,0 +1,24 @@
+def index_by(items, key="id") -> dict:
+    """
+    Builds a dictionary of items keyed by ID, so a response set can be joined in O(n) instead of scanning
+    it once per row. Works with objects and dicts; later items win when a key repeats.
+
+    Arguments:
+        items: The items to index.
+        key: The attribute or dict key holding the ID, or a callable returning it.
+    """
+    if callable(key):
+        return {key(item): item for item in items}
+    return {(item[key] if isinstance(item, dict) else getattr(item, key)): item for item in items}
+
+
+def image_index(thumbnails, default=None) -> dict:
+    """
+    Maps each thumbnail's target ID to its image URL. Thumbnails that are still pending, blocked or errored
+    have no URL and map to `default`, same as targets missing from the response.
+
+    Arguments:
+        thumbnails: The Thumbnail objects returned by a thumbnails endpoint.
+        default: The value used for thumbnails without an image URL.
+    """
+    return {thumbnail.target_id: thumbnail.image_url or default for thumbnail in thumbnails}
@@ -1,33 +1,291 @@
+import math
+import threading
+import time
+from collections import deque, OrderedDict
 
+import trio
 import api
-import webview
-import json
+import mapping.database as database
+from api.presence import PresenceProvider
+from api.utilities.requests import Lane, request_lane
+from .events import EventBus, dispatch_event, event_bus
+from .replay import replay_realtime
 from .user import User
 
 
 class Realtime:
-    def __init__(self, client: api.Client, user_client=None):
+    """
+    Handles realtime notifications.
+
+    Notification callbacks run on signalrcore's thread, so they only invalidate the presence store and push
+    the changed user IDs into a queue. A single long-lived worker drains that queue, merges the IDs received
+    within `coalesce_window` seconds, fetches them in one batch and dispatches one UI update per batch.
+    """
+
+    def __init__(self, client: api.Client, user_client=None, coalesce_window: float = 0.25, bus: EventBus = event_bus):
         self.client = client
         self.user_client = user_client()
+        self.bus = bus
         self.websocket = client.websocket
+        self.coalesce_window = coalesce_window
+
+        self.notifications = 0
+        self.batches = 0
+        self.users_fetched = 0
+        self.busy = False
+        self.lag_samples: deque[float] = deque(maxlen=256)
+
+        self._send_channel: trio.MemorySendChannel = None
+        self._receive_channel: trio.MemoryReceiveChannel = None
+        self._trio_token = None
+        self._worker_ready = threading.Event()
+        self._worker_thread: threading.Thread = None
+
+        self.accounts = AccountConnections()
+
         if self.websocket:
+            self._start_worker()
             self.websocket.on_presence_bulk_notifications(
                 self._handle_presence_bulk_notifications)
 
     def _dispatch_event(self, event_name: str, detail: dict):
-        detail_json = json.dumps(detail)
-        for main_window in webview.windows:
-            try:
-                main_window.evaluate_js(
-                    f"window.dispatchEvent(new CustomEvent('{event_name}', {{detail: {detail_json}}}))")
-            except webview.JavascriptException as e:
-                print(
-                    f"Error dispatching {event_name} event: {e}", flush=True)
+        dispatch_event(event_name, detail)
+
+    def _start_worker(self):
+        async def run():
+            self._trio_token = trio.lowlevel.current_trio_token()
+            self._send_channel, self._receive_channel = trio.open_memory_channel(math.inf)
+            self._worker_ready.set()
+            # presence refreshes yield to requests the user is waiting on
+            with request_lane(Lane.background):
+                await self._presence_worker()
+
+        self._worker_thread = threading.Thread(
+            target=trio.run, args=(run,), daemon=True)
+        self._worker_thread.start()
 
     def _handle_presence_bulk_notifications(self, data: list[dict]):
         ids = [entry["UserId"] for entry in data]
-        if not self.user_client:
+        # only the users named in the notification changed, everyone else stays served from the presence store
+        self.client.presence.invalidate(ids)
+        if not self.user_client or not self._worker_ready.wait(timeout=5):
             return
-        presences = self.user_client.get_users_presence(ids)
 
-        self._dispatch_event("presencesUpdate", presences)
+        try:
+            trio.from_thread.run_sync(
+                self._send_channel.send_nowait, (time.monotonic(), ids), trio_token=self._trio_token)
+        except trio.RunFinishedError:
+            pass
+
+    async def _presence_worker(self):
+        async for received_at, ids in self._receive_channel:
+            self.busy = True
+            self.notifications += 1
+            batch = dict.fromkeys(ids)
+            oldest = received_at
+
+            # merge whatever else arrives while the window is open
+            with trio.move_on_after(self.coalesce_window):
+                async for received_at, ids in self._receive_channel:
+                    self.notifications += 1
+                    batch.update(dict.fromkeys(ids))
+                    oldest = min(oldest, received_at)
+
+            try:
+                presences = await self.user_client._fetch_users_presence(list(batch))
+            except Exception as e:
+                print(f"Error fetching presences: {e}", flush=True)
+                self.busy = False
+                continue
+
+            # several batches within a frame go out together, one entry per user
+            self.bus.emit_entities("presencesUpdate", presences)
+
+            self.batches += 1
+            self.users_fetched += len(batch)
+            self.lag_samples.append(time.monotonic() - oldest)
+            self.busy = False
+
+    def stop(self):
+        """Stops the presence worker once it has drained the queue."""
+        if self._worker_ready.is_set():
+            try:
+                trio.from_thread.run_sync(
+                    self._send_channel.close, trio_token=self._trio_token)
+            except trio.RunFinishedError:
+                pass
+
+    def start_recording(self, path: str):
+        """Records the raw realtime notification stream to the passed file, for `replay`."""
+        if self.websocket:
+            self.websocket.start_recording(path)
+
+    def stop_recording(self):
+        if self.websocket:
+            self.websocket.stop_recording()
+
+    def replay(self, path: str, speed: float = 1.0):
+        """Replays a recording offline through a separate pipeline and returns the benchmark report."""
+        return replay_realtime(path, speed)
+
+    def get_metrics(self):
+        lags = sorted(self.lag_samples)
+        queue_depth = self._receive_channel.statistics(
+        ).current_buffer_used if self._receive_channel else 0
+        return {
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "usersFetched": self.users_fetched,
+            "queueDepth": queue_depth,
+            "lastLag": self.lag_samples[-1] if self.lag_samples else 0.0,
+            "p50Lag": lags[len(lags) // 2] if lags else 0.0,
+            "p95Lag": lags[min(len(lags) - 1, int(len(lags) * 0.95))] if lags else 0.0,
+            "maxLag": lags[-1] if lags else 0.0,
+            "dispatch": self.bus.stats(),
+            "connection": self.websocket.stats() if self.websocket else None,
+        }
+
+
+class AccountConnection:
+    """
+    The realtime connection of a stored account that is not the active one, and the caches it keeps warm.
+
+    The account gets its own client, so its presence store and session are separate from the active account's.
+    Notifications only update local state: changed presences are invalidated (and refetched on demand once the
+    account becomes active), new chat messages are counted and friendship changes are passed to `on_friendship`.
+    """
+
+    def __init__(self, account_id: int, token: str, on_friendship=None):
+        self.account_id = account_id
+        self.on_friendship = on_friendship
+        self.client = api.Client(token)
+        self.unread_chat = 0
+        self.friends_changed = False
+        self.notifications = 0
+
+        self.client.websocket.on_presence_bulk_notifications(self._handle_presence)
+        self.client.websocket.on_chat_notifications(self._handle_chat)
+        self.client.websocket.on_friendship_notifications(self._handle_friendship)
+
+    def _handle_presence(self, data: list[dict]):
+        self.notifications += 1
+        self.client.presence.invalidate([entry["UserId"] for entry in data])
+
+    def _handle_chat(self, data: dict):
+        self.notifications += 1
+        if data.get("Type") == "NewMessage":
+            self.unread_chat += 1
+
+    def _handle_friendship(self, data: dict):
+        self.notifications += 1
+        self.friends_changed = True
+        if self.on_friendship:
+            self.on_friendship(self.account_id, data)
+
+    def stop(self):
+        self.client.websocket.stop()
+
+    def stats(self) -> dict:
+        return {
+            "accountId": self.account_id,
+            "notifications": self.notifications,
+            "unreadChat": self.unread_chat,
+            "friendsChanged": self.friends_changed,
+            "connection": self.client.websocket.stats(),
+        }
+
+
+class AccountConnections:
+    """
+    Optionally keeps a realtime connection open for stored accounts other than the active one, so switching to
+    one of them starts from warm caches instead of a cold fetch. At most `max_connections` connections are kept,
+    for the most recently used accounts.
+    """
+
+    def __init__(self, max_connections: int = 4):
+        self.max_connections = max_connections
+        self.enabled = False
+        # called with (account_id, payload) for FriendshipNotifications received by a background account
+        self.on_friendship = None
+        # least recently used first
+        self.connections: OrderedDict[int, AccountConnection] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _open(self, account_id: int, token: str = None) -> AccountConnection:
+        connection = self.connections.get(account_id)
+        if connection:
+            self.connections.move_to_end(account_id)
+            return connection
+
+        if token is None:
+            token = database.get_account(account_id)["cookie"]
+        connection = AccountConnection(account_id, token, self.on_friendship)
+        self.connections[account_id] = connection
+        while len(self.connections) > self.max_connections:
+            self.connections.popitem(last=False)[1].stop()
+        return connection
+
+    def enable(self):
+        """Opens connections for the stored accounts that aren't active, up to `max_connections`."""
+        with self._lock:
+            self.enabled = True
+            active = database.get_last_account()
+            active_id = active["id"] if active else None
+            for account in database.get_all_accounts()[:self.max_connections + 1]:
+                if account["id"] != active_id and len(self.connections) < self.max_connections:
+                    self._open(account["id"])
+        return self.stats()
+
+    def disable(self):
+        """Closes every background connection."""
+        with self._lock:
+            self.enabled = False
+            while self.connections:
+                self.connections.popitem()[1].stop()
+
+    def close(self, account_id: int):
+        """Closes the background connection of the passed account, if there is one."""
+        with self._lock:
+            connection = self.connections.pop(account_id, None)
+        if connection:
+            connection.stop()
+
+    def detach(self, account: dict, presence: PresenceProvider):
+        """
+        Called before switching away from `account`. Keeps that account connected in the background and
+        hands it the active presence store.
+        """
+        if not self.enabled or not account:
+            return
+        with self._lock:
+            connection = self._open(account["id"], account["cookie"])
+            connection.client.presence.restore(presence.snapshot())
+
+    def attach(self, account_id: int, presence: PresenceProvider) -> dict:
+        """
+        Called after switching to `account_id`. The active connection takes over, so the background one is
+        closed and its warm presence store is moved into the active one.
+
+        Returns:
+            What happened while the account was in the background, or None if it had no connection.
+        """
+        with self._lock:
+            connection = self.connections.pop(account_id, None)
+        if not connection:
+            return None
+        presence.restore(connection.client.presence.snapshot())
+        connection.stop()
+        return connection.stats()
+
+    def get_unread_counts(self) -> dict:
+        """Returns the number of new chat messages received by each background account."""
+        with self._lock:
+            return {account_id: connection.unread_chat for account_id, connection in self.connections.items()}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "maxConnections": self.max_connections,
+                "accounts": [connection.stats() for connection in self.connections.values()],
+            }
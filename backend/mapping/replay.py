@@ -0,0 +1,137 @@
+import json
+import time
+
+import trio
+import api
+from api.realtime import WebSocketBuilder
+from .events import EventBus
+
+
+def percentile(samples: list, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class OfflineUsers:
+    """
+    Stands in for the User mapping during a replay: presences are answered after a fixed delay instead of
+    over HTTP, so the numbers measure the realtime pipeline rather than the network.
+    """
+
+    def __init__(self, fetch_latency: float = 0.05):
+        self.fetch_latency = fetch_latency
+        self.fetches = 0
+
+    async def _fetch_users_presence(self, user_ids: list):
+        self.fetches += 1
+        await trio.sleep(self.fetch_latency)
+        return [{
+            "id": user_id,
+            "presence": {
+                "type": "online",
+                "place": None,
+                "universe": None,
+                "job": None,
+                "lastLocation": None
+            }
+        } for user_id in user_ids]
+
+
+class NotificationReplayer:
+    """
+    Feeds a notification stream recorded with `WebSocketBuilder.start_recording` into the handler pipeline
+    without a live socket, at the recorded pace divided by `speed`.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            self.notifications: list[tuple[float, list]] = [
+                (entry["t"], entry["data"]) for entry in map(json.loads, f) if entry.get("data")]
+
+    def replay(self, websocket: WebSocketBuilder, speed: float = 1.0) -> dict:
+        """
+        Replays every notification into `websocket`'s registered handlers on the calling thread.
+
+        Returns:
+            Handler throughput, how late notifications were delivered and handler latency percentiles.
+        """
+        handler_times = []
+        delivery_lags = []
+        first_at = self.notifications[0][0] if self.notifications else 0.0
+
+        started_at = time.monotonic()
+        for recorded_at, data in self.notifications:
+            due = started_at + (recorded_at - first_at) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            delivery_lags.append(max(0.0, time.monotonic() - due))
+
+            handler_started_at = time.perf_counter()
+            websocket._on_notification(data)
+            handler_times.append(time.perf_counter() - handler_started_at)
+        elapsed = time.monotonic() - started_at
+
+        return {
+            "notifications": len(self.notifications),
+            "speed": speed,
+            "elapsed": elapsed,
+            "notificationsPerSecond": len(self.notifications) / elapsed if elapsed else 0.0,
+            "handlerSeconds": sum(handler_times),
+            "handlerP50": percentile(handler_times, 0.5),
+            "handlerP95": percentile(handler_times, 0.95),
+            "handlerP99": percentile(handler_times, 0.99),
+            "handlerMax": max(handler_times, default=0.0),
+            "deliveryLagP95": percentile(delivery_lags, 0.95),
+        }
+
+
+def replay_realtime(path: str, speed: float = 1.0, fetch_latency: float = 0.05, drain_timeout: float = 10.0) -> dict:
+    """
+    Replays a recording through a fresh Realtime pipeline (presence store, coalescing worker and UI event bus)
+    and reports handler throughput, UI dispatch counts and end-to-end latency percentiles.
+
+    Arguments:
+        path: The recording to replay.
+        speed: How many times faster than recorded to replay, e.g. 1, 10 or 100.
+        fetch_latency: How long each batched presence fetch takes.
+        drain_timeout: How long to wait for queued notifications to be dispatched after the replay.
+    """
+    from .realtime import Realtime
+
+    client = api.Client(enable_websocket=False)
+    client.websocket = WebSocketBuilder(url="", token=None, connect=False)
+    users = OfflineUsers(fetch_latency)
+    # a separate bus that delivers nowhere, so replayed presences never reach the UI
+    bus = EventBus(windows=lambda: [])
+    realtime = Realtime(client, lambda: users, bus=bus)
+
+    replayer = NotificationReplayer(path)
+    presence_notifications = sum(
+        1 for _, data in replayer.notifications if data[0] == "PresenceBulkNotifications")
+    report = replayer.replay(client.websocket, speed)
+
+    # wait until the worker has fetched and dispatched everything that was queued
+    deadline = time.monotonic() + drain_timeout
+    while time.monotonic() < deadline:
+        if realtime.notifications == presence_notifications and realtime.get_metrics()["queueDepth"] == 0 \
+                and not realtime.busy:
+            break
+        time.sleep(0.01)
+    realtime.stop()
+    bus.flush()
+
+    lags = list(realtime.lag_samples)
+    report.update({
+        "presenceBatches": realtime.batches,
+        "presenceFetches": users.fetches,
+        "uiEvents": bus.events,
+        "uiFrames": bus.frames,
+        "uiEntitiesSent": bus.entities_sent,
+        "endToEndP50": percentile(lags, 0.5),
+        "endToEndP95": percentile(lags, 0.95),
+        "endToEndP99": percentile(lags, 0.99),
+    })
+    return report
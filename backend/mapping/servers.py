@@ -0,0 +1,615 @@
+import threading
+import time
+from array import array
+from bisect import insort
+from collections import OrderedDict
+
+import trio
+import api
+from api.jobs import PrivateServer, Server, ServerType
+from api.utilities.exceptions import NoMoreItems
+from api.utilities.iterators import PageIterator, SortOrder
+from .events import dispatch_event
+from .tasks import CancellableTask
+
+# Largest page size accepted by games v1/games/{placeId}/servers
+MAX_SERVER_PAGE_SIZE = 100
+
+# Largest number of tokens accepted by a single thumbnails v1/batch request
+MAX_TOKEN_BATCH_SIZE = 100
+
+# Upper bounds (exclusive, in percent) of the fill distribution buckets.
+# Full servers always land in the last bucket.
+FILL_BUCKETS = (25, 50, 75, 100)
+
+
+# Score weights per join_best_server strategy. Every component is normalised to 0..1.
+STRATEGIES = {
+    "balanced": {"ping": 0.4, "free": 0.2, "fps": 0.2, "friends": 0.2},
+    "ping": {"ping": 1.0, "free": 0.1, "fps": 0.1, "friends": 0.0},
+    "friends": {"ping": 0.2, "free": 0.1, "fps": 0.1, "friends": 1.0},
+    "empty": {"ping": 0.2, "free": 1.0, "fps": 0.1, "friends": 0.0},
+}
+
+# Pings at or above this many milliseconds score zero
+PING_CEILING = 500
+
+
+def _fill_bucket(playing: int, max_players: int) -> int:
+    if max_players <= 0 or playing >= max_players:
+        return len(FILL_BUCKETS)
+    percent = playing * 100 // max_players
+    for bucket, upper in enumerate(FILL_BUCKETS):
+        if percent < upper:
+            return bucket
+    return len(FILL_BUCKETS)
+
+
+class ServerIndex:
+    """
+    Columnar index of a place's public servers.
+
+    Numeric fields live in typed arrays so that tens of thousands of servers stay cheap to hold and scan.
+    Sorted/filtered views are built on first use and then sliced, so paging through a view costs only the size
+    of the page. Rows added while a scan is running are merged into the existing views instead of re-sorting them.
+    """
+
+    def __init__(self, place_id: int):
+        self.place_id = place_id
+        self.ids: list[str] = []
+        self.playing = array("H")
+        self.max_players = array("H")
+        self.ping = array("i")  # -1 when unknown
+        self.fps = array("f")  # -1 when unknown
+        self.player_tokens: list[list[str]] = []
+        self.complete = False
+        self.scanned_at = None
+        self.pages = 0
+
+        self._positions: dict[str, int] = {}
+        self._views: dict[tuple, list[int]] = {}
+        self._lock = threading.Lock()
+
+        self.total_players = 0
+        self.total_capacity = 0
+        self.fill_distribution = [0] * (len(FILL_BUCKETS) + 1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, servers: list[Server]) -> list[int]:
+        """Inserts or updates servers and returns the row numbers that changed."""
+        rows = []
+        updated = []
+        with self._lock:
+            for server in servers:
+                if not server.id:
+                    continue
+                playing = server.playing or 0
+                max_players = server.max_players or 0
+                ping = server.ping if server.ping is not None else -1
+                fps = server.fps if server.fps is not None else -1
+
+                row = self._positions.get(server.id)
+                if row is None:
+                    row = len(self.ids)
+                    self._positions[server.id] = row
+                    self.ids.append(server.id)
+                    self.playing.append(playing)
+                    self.max_players.append(max_players)
+                    self.ping.append(ping)
+                    self.fps.append(fps)
+                    self.player_tokens.append(server.player_tokens)
+                else:
+                    self._untrack(row)
+                    updated.append(row)
+                    self.playing[row] = playing
+                    self.max_players[row] = max_players
+                    self.ping[row] = ping
+                    self.fps[row] = fps
+                    self.player_tokens[row] = server.player_tokens
+                self._track(row)
+                rows.append(row)
+
+            self.pages += 1
+            self._merge_into_views(rows, updated)
+        return rows
+
+    def _merge_into_views(self, rows: list[int], updated: list[int]):
+        # updated rows are taken out first, their old position no longer matches their values
+        rows = list(dict.fromkeys(rows))
+        for (sort, descending, filter_items), view in self._views.items():
+            for row in updated:
+                if row in view:
+                    view.remove(row)
+            filters = dict(filter_items)
+            key = self._sort_key(sort, descending)
+            # views are sorted in descending order by negating the key, same as sort(reverse=True)
+            insort_key = (lambda row, key=key: -key(row)) if descending else key
+            for row in rows:
+                if not filters or self._matches(row, filters):
+                    insort(view, row, key=insort_key)
+
+    def _track(self, row: int):
+        self.total_players += self.playing[row]
+        self.total_capacity += self.max_players[row]
+        self.fill_distribution[_fill_bucket(
+            self.playing[row], self.max_players[row])] += 1
+
+    def _untrack(self, row: int):
+        self.total_players -= self.playing[row]
+        self.total_capacity -= self.max_players[row]
+        self.fill_distribution[_fill_bucket(
+            self.playing[row], self.max_players[row])] -= 1
+
+    def _sort_key(self, sort: str, descending: bool):
+        missing = float("-inf") if descending else float("inf")
+        if sort == "playing":
+            return self.playing.__getitem__
+        if sort == "maxPlayers":
+            return self.max_players.__getitem__
+        if sort == "free":
+            return lambda row: self.max_players[row] - self.playing[row]
+        if sort == "fill":
+            return lambda row: self.playing[row] / self.max_players[row] if self.max_players[row] else 1
+        if sort == "ping":
+            return lambda row: self.ping[row] if self.ping[row] >= 0 else missing
+        if sort == "fps":
+            return lambda row: self.fps[row] if self.fps[row] >= 0 else missing
+        raise ValueError(f"Unknown sort key: {sort}")
+
+    def _matches(self, row: int, filters: dict) -> bool:
+        free = self.max_players[row] - self.playing[row]
+        if filters.get("notFull") and free <= 0:
+            return False
+        if filters.get("minFreeSlots") is not None and free < filters["minFreeSlots"]:
+            return False
+        if filters.get("minPlaying") is not None and self.playing[row] < filters["minPlaying"]:
+            return False
+        if filters.get("maxPing") is not None and not 0 <= self.ping[row] <= filters["maxPing"]:
+            return False
+        if filters.get("minFps") is not None and self.fps[row] < filters["minFps"]:
+            return False
+        return True
+
+    def _view(self, sort: str, descending: bool, filters: dict) -> list[int]:
+        key = (sort, descending, tuple(sorted(filters.items())))
+        view = self._views.get(key)
+        if view is None:
+            view = [row for row in range(len(self.ids))
+                    if self._matches(row, filters)] if filters else list(range(len(self.ids)))
+            view.sort(key=self._sort_key(sort, descending), reverse=descending)
+            self._views[key] = view
+        return view
+
+    def query(self, sort: str = "playing", descending: bool = True, filters: dict = None, offset: int = 0, limit: int = 10):
+        """Returns a window of rows from the sorted/filtered view and the view's total size."""
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        with self._lock:
+            view = self._view(sort, descending, filters)
+            return [self.row(row) for row in view[offset:offset + limit]], len(view)
+
+    def row(self, row: int) -> dict:
+        return {
+            "id": self.ids[row],
+            "maxPlayers": self.max_players[row],
+            "playing": self.playing[row],
+            "playerTokens": self.player_tokens[row],
+            "fps": self.fps[row] if self.fps[row] >= 0 else None,
+            "ping": self.ping[row] if self.ping[row] >= 0 else None,
+        }
+
+    def rows(self, rows: list[int]) -> list[dict]:
+        with self._lock:
+            return [self.row(row) for row in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "placeId": self.place_id,
+                "servers": len(self.ids),
+                "totalPlayers": self.total_players,
+                "totalCapacity": self.total_capacity,
+                "fillDistribution": list(self.fill_distribution),
+                "pages": self.pages,
+                "complete": self.complete,
+            }
+
+
+class ServerScan(CancellableTask):
+    """A background scan of one place."""
+
+    def __init__(self, index: ServerIndex):
+        super().__init__()
+        self.index = index
+        self.thread: threading.Thread = None
+
+
+async def next_page_with_retry(iterator, max_retries: int = 3):
+    """Fetches the iterator's next page, backing off on transient failures such as rate limits."""
+    for attempt in range(max_retries):
+        try:
+            return await iterator.next()
+        except NoMoreItems:
+            raise
+        except Exception as e:
+            if attempt < max_retries - 1:
+                await trio.sleep(1.0 * (attempt + 1))
+                continue
+            raise e
+
+
+class ServerBrowser:
+    """
+    Streams every page of a place's public servers into a ServerIndex in the background.
+    Each page is pushed to the UI as a `serverScanPage` event, followed by `serverScanComplete`.
+    """
+
+    def __init__(self, client: api.Client, max_places: int = 3, max_age: float = 60.0, max_retries: int = 3):
+        self.client = client
+        self.max_places = max_places
+        self.max_age = max_age
+        self.max_retries = max_retries
+        self._scans: OrderedDict[int, ServerScan] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, place_id: int, refresh: bool = False) -> dict:
+        with self._lock:
+            scan = self._scans.get(place_id)
+            if scan and not refresh:
+                fresh = scan.index.scanned_at and time.time() - \
+                    scan.index.scanned_at < self.max_age
+                if not scan.done.is_set() or fresh:
+                    self._scans.move_to_end(place_id)
+                    return scan.index.stats()
+            if scan:
+                scan.cancel()
+
+            scan = ServerScan(ServerIndex(place_id))
+            self._scans[place_id] = scan
+            self._scans.move_to_end(place_id)
+            while len(self._scans) > self.max_places:
+                _, evicted = self._scans.popitem(last=False)
+                evicted.cancel()
+
+        scan.thread = threading.Thread(
+            target=trio.run, args=(self._scan, scan), daemon=True)
+        scan.thread.start()
+        return scan.index.stats()
+
+    def stop(self, place_id: int):
+        scan = self._scans.get(place_id)
+        if scan:
+            scan.cancel()
+
+    def get_index(self, place_id: int) -> ServerIndex:
+        scan = self._scans.get(place_id)
+        if not scan:
+            raise ValueError(
+                "No server scan for this place. Call scan_servers first.")
+        return scan.index
+
+    async def _scan(self, scan: ServerScan):
+        index = scan.index
+        error = None
+        try:
+            await scan.run(self._scan_pages, index)
+            index.complete = not scan.cancelled
+        except Exception as e:
+            error = str(e)
+            print(f"Server scan error: {e}", flush=True)
+        finally:
+            index.scanned_at = time.time()
+
+        dispatch_event("serverScanComplete", {
+            "placeId": index.place_id,
+            "cancelled": scan.cancelled,
+            "error": error,
+            "stats": index.stats(),
+        })
+
+    async def _scan_pages(self, index: ServerIndex):
+        iterator = self.client.places.get_base_place(index.place_id).get_servers(
+            server_type=ServerType.public, page_size=MAX_SERVER_PAGE_SIZE
+        )
+        while True:
+            try:
+                servers = await next_page_with_retry(iterator, self.max_retries)
+            except NoMoreItems:
+                break
+            rows = index.add(servers)
+            dispatch_event("serverScanPage", {
+                "placeId": index.place_id,
+                "servers": index.rows(rows),
+                "stats": index.stats(),
+            })
+            if not iterator.next_cursor:
+                break
+
+
+class UserServerSearch(CancellableTask):
+    """State and throughput counters for one find-user-in-server search."""
+
+    def __init__(self, place_id: int, target_url: str):
+        super().__init__()
+        self.place_id = place_id
+        self.target_url = target_url
+        self.server_id: str = None
+        self.pages = 0
+        self.servers_scanned = 0
+        self.tokens_resolved = 0
+        self.started_at = time.monotonic()
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            "placeId": self.place_id,
+            "pages": self.pages,
+            "servers": self.servers_scanned,
+            "tokens": self.tokens_resolved,
+            "elapsed": elapsed,
+            "serversPerSecond": self.servers_scanned / elapsed,
+            "tokensPerSecond": self.tokens_resolved / elapsed,
+        }
+
+
+class ServerFinder:
+    """
+    Looks for the public server a user is in by resolving every server's player tokens to headshot URLs
+    and comparing them with the user's own headshot URL.
+
+    Pages are fetched one after another (the cursor chains them) while a pool of workers resolves the
+    previous pages' tokens in full-size v1/batch requests. The search stops as soon as a match is found.
+    """
+
+    def __init__(self, client: api.Client, avatar_cache: dict, workers: int = 4, max_retries: int = 3):
+        self.client = client
+        self.avatar_cache = avatar_cache
+        self.workers = workers
+        self.max_retries = max_retries
+        self._searches: dict[int, UserServerSearch] = {}
+
+    def cancel(self, place_id: int):
+        search = self._searches.get(place_id)
+        if search:
+            search.cancel()
+
+    async def find(self, place_id: int, target_url: str) -> dict:
+        previous = self._searches.get(place_id)
+        if previous:
+            previous.cancel()
+        search = UserServerSearch(place_id, target_url)
+        self._searches[place_id] = search
+        try:
+            await search.run(self._search, search)
+        finally:
+            if self._searches.get(place_id) is search:
+                del self._searches[place_id]
+
+        return {
+            "found": search.server_id is not None,
+            "serverId": search.server_id,
+            "cancelled": search.cancelled,
+            "stats": search.stats(),
+        }
+
+    async def _search(self, search: UserServerSearch):
+        send_channel, receive_channel = trio.open_memory_channel(self.workers)
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(self._produce, search,
+                               send_channel, nursery.cancel_scope)
+            async with receive_channel:
+                for _ in range(self.workers):
+                    nursery.start_soon(self._resolve, search,
+                                       receive_channel.clone(), nursery.cancel_scope)
+
+    def _found(self, search: UserServerSearch, server_id: str, cancel_scope: trio.CancelScope):
+        if search.server_id is None:
+            search.server_id = server_id
+            cancel_scope.cancel()
+
+    async def _produce(self, search: UserServerSearch, send_channel, cancel_scope: trio.CancelScope):
+        iterator = self.client.places.get_base_place(search.place_id).get_servers(
+            server_type=ServerType.public, page_size=MAX_SERVER_PAGE_SIZE
+        )
+        async with send_channel:
+            batch: list[tuple[str, str]] = []
+            while True:
+                try:
+                    servers = await next_page_with_retry(iterator, self.max_retries)
+                except NoMoreItems:
+                    break
+                search.pages += 1
+                search.servers_scanned += len(servers)
+
+                for server in servers:
+                    for token in server.player_tokens:
+                        # Tokens resolved earlier (e.g. by the server list) need no request
+                        if self.avatar_cache.get(token) == search.target_url:
+                            self._found(search, server.id, cancel_scope)
+                            return
+                        if token not in self.avatar_cache:
+                            batch.append((token, server.id))
+                    while len(batch) >= MAX_TOKEN_BATCH_SIZE:
+                        await send_channel.send(batch[:MAX_TOKEN_BATCH_SIZE])
+                        batch = batch[MAX_TOKEN_BATCH_SIZE:]
+
+                dispatch_event("findUserProgress", search.stats(), replace=True)
+                if not iterator.next_cursor:
+                    break
+            if batch:
+                await send_channel.send(batch)
+
+    async def _resolve(self, search: UserServerSearch, receive_channel, cancel_scope: trio.CancelScope):
+        async with receive_channel:
+            async for batch in receive_channel:
+                servers_by_token = dict(batch)
+                avatars = await self.client.thumbnails.get_user_avatar_with_token(
+                    tokens=list(servers_by_token),
+                    size=(48, 48),
+                    image_format=api.ThumbnailFormat.webp,
+                    batch_size=MAX_TOKEN_BATCH_SIZE,
+                )
+                search.tokens_resolved += len(avatars)
+                for avatar in avatars:
+                    # Extract token from requestId format: 0:TOKEN:AvatarHeadshot:48x48:webp:regular:
+                    request_parts = avatar.request_id.split(":")
+                    if len(request_parts) < 2:
+                        continue
+                    token = request_parts[1]
+                    self.avatar_cache[token] = avatar.image_url
+                    if avatar.image_url and avatar.image_url == search.target_url:
+                        self._found(
+                            search, servers_by_token[token], cancel_scope)
+                        return
+
+
+def score_server(server: Server, friends: int, weights: dict) -> float:
+    """Scores a server for join_best_server; higher is better."""
+    ping = 1 - min(server.ping, PING_CEILING) / \
+        PING_CEILING if server.ping is not None else 0
+    free = (server.max_players - server.playing) / \
+        server.max_players if server.max_players else 0
+    fps = min(server.fps, 60) / 60 if server.fps else 0
+    return (
+        weights["ping"] * ping
+        + weights["free"] * free
+        + weights["fps"] * fps
+        + weights["friends"] * min(friends, 3) / 3
+    )
+
+
+async def pick_best_server(client: api.Client, place_id: int, strategy: str = "balanced", deadline: float = 3.0) -> dict:
+    """
+    Samples a place's server list and returns the best joinable server for the strategy.
+
+    Several independent page chains (friend servers, busiest first, emptiest first, non-full only) are
+    walked concurrently and all of them are abandoned once `deadline` seconds have passed, so the
+    choice is made from whatever was sampled in time regardless of how many servers the place has.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    weights = STRATEGIES[strategy]
+    baseplace = client.places.get_base_place(place_id)
+    servers: dict[str, Server] = {}
+    friends: dict[str, int] = {}
+    started_at = time.monotonic()
+
+    async def walk(server_type: ServerType, sort_order: SortOrder, exclude_full_games: bool):
+        iterator = baseplace.get_servers(
+            server_type=server_type,
+            page_size=MAX_SERVER_PAGE_SIZE,
+            sort_order=sort_order,
+            exclude_full_games=exclude_full_games,
+        )
+        while True:
+            try:
+                page = await iterator.next()
+            except NoMoreItems:
+                return
+            except Exception as e:
+                # No time for retries within the budget; the other chains keep sampling
+                print(f"Server sampling error: {e}", flush=True)
+                return
+            for server in page:
+                if not server.id:
+                    continue
+                servers[server.id] = server
+                if server_type == ServerType.friend:
+                    friends[server.id] = len(server.players)
+            if not iterator.next_cursor:
+                return
+
+    with trio.move_on_after(deadline):
+        async with trio.open_nursery() as nursery:
+            nursery.start_soon(walk, ServerType.friend,
+                               SortOrder.Descending, False)
+            nursery.start_soon(walk, ServerType.public,
+                               SortOrder.Descending, True)
+            nursery.start_soon(walk, ServerType.public,
+                               SortOrder.Ascending, True)
+
+    best = None
+    best_score = None
+    for server in servers.values():
+        if server.max_players and server.playing >= server.max_players:
+            continue
+        score = score_server(server, friends.get(server.id, 0), weights)
+        if best_score is None or score > best_score:
+            best, best_score = server, score
+
+    return {
+        "server": {
+            "id": best.id,
+            "maxPlayers": best.max_players,
+            "playing": best.playing,
+            "fps": best.fps,
+            "ping": best.ping,
+            "friends": friends.get(best.id, 0),
+        } if best else None,
+        "score": best_score,
+        "sampled": len(servers),
+        "elapsed": time.monotonic() - started_at,
+    }
+
+
+class PrivateServerPages:
+    """
+    Cached pages of a place's private servers for one account.
+
+    The private-server set (names, access codes, owners) rarely changes, so visited pages are kept in memory
+    and the iterator's recorded cursors let any of them be refetched directly. Revisiting a page returns it
+    from memory; refreshing a stale page refetches it and only copies the volatile fields onto the cached servers.
+    """
+
+    VOLATILE_FIELDS = ("playing", "player_tokens", "players", "ping", "fps")
+
+    def __init__(self, place_id: int, page_size: int, iterator: PageIterator, max_age: float = 15.0):
+        self.place_id = place_id
+        self.page_size = page_size
+        self.iterator = iterator
+        self.max_age = max_age
+        self.position = 0
+        self.pages: list[list[PrivateServer]] = []
+        self.fetched_at: list[float] = []
+
+    def next_cursor(self, page: int) -> str:
+        cursors = self.iterator.page_cursors
+        return cursors[page + 1] if page + 1 < len(cursors) else None
+
+    async def _fetch(self, page: int) -> list[PrivateServer]:
+        if page >= len(self.iterator.page_cursors) or self.iterator.page_cursors[page] is None:
+            raise NoMoreItems("No more items.")
+        self.iterator.seek(page)
+        return await self.iterator.next()
+
+    async def get_page(self, page: int, refresh: bool = True) -> list[PrivateServer]:
+        """
+        Returns a page (0-based). Cached pages are returned as-is unless `refresh` is set and they are older
+        than `max_age`, in which case their volatile fields are refreshed. Pages that weren't visited yet are
+        reached by walking forward from the last visited one; NoMoreItems is raised if the list ends before.
+        """
+        if page < len(self.pages):
+            if refresh and time.time() - self.fetched_at[page] >= self.max_age:
+                self._merge(page, await self._fetch(page))
+            return self.pages[page]
+
+        while len(self.pages) <= page:
+            servers = await self._fetch(len(self.pages))
+            self.pages.append(servers)
+            self.fetched_at.append(time.time())
+        return self.pages[page]
+
+    def _merge(self, page: int, fresh: list[PrivateServer]):
+        cached = {server.vip_server_id: server for server in self.pages[page]}
+        merged = []
+        for server in fresh:
+            known = cached.get(server.vip_server_id)
+            if known:
+                for field in self.VOLATILE_FIELDS:
+                    setattr(known, field, getattr(server, field))
+                merged.append(known)
+            else:
+                merged.append(server)
+        self.pages[page] = merged
+        self.fetched_at[page] = time.time()
@@ -0,0 +1,152 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import trio
+
+_shared = threading.local()
+
+
+@contextmanager
+def shared_loop(trio_token):
+    """
+    Makes `run_call` and `RequestSlots.run` on this thread run their work on the event loop of `trio_token`
+    instead of starting one per call, so several js_api calls made from worker threads of that loop share it.
+    """
+    _shared.trio_token = trio_token
+    try:
+        yield
+    finally:
+        _shared.trio_token = None
+
+
+def run_call(async_fn, *args):
+    """
+    Runs the async work of a js_api call and returns its result. The work gets its own event loop unless the
+    thread is inside `shared_loop`.
+    """
+    trio_token = getattr(_shared, "trio_token", None)
+    if trio_token:
+        return trio.from_thread.run(async_fn, *args, trio_token=trio_token)
+    return trio.run(async_fn, *args)
+
+
+class CancellableTask:
+    """Runs an async function under a cancel scope that can be cancelled from any thread or event loop."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.cancelled = False
+        self._cancel_scope: trio.CancelScope = None
+        self._trio_token = None
+        self._lock = threading.Lock()
+
+    async def run(self, async_fn, *args):
+        self._trio_token = trio.lowlevel.current_trio_token()
+        cancel_scope = trio.CancelScope()
+        try:
+            with cancel_scope:
+                self._cancel_scope = cancel_scope
+                if self.cancelled:
+                    cancel_scope.cancel()
+                return await async_fn(*args)
+        finally:
+            with self._lock:
+                # a cancel that arrived after the work finished didn't cancel anything
+                self.cancelled = cancel_scope.cancelled_caught
+                self.done.set()
+
+    def cancel(self):
+        with self._lock:
+            if self.done.is_set():
+                return
+            self.cancelled = True
+        if self._cancel_scope:
+            # not from_thread.run_sync, which can't be called from inside an event loop, e.g. by a task
+            # superseding another one on the same loop
+            try:
+                self._trio_token.run_sync_soon(self._cancel_scope.cancel)
+            except trio.RunFinishedError:
+                pass
+
+
+class RequestSlots:
+    """
+    Runs js_api calls so that a newer call in the same slot cancels the one still running in it.
+
+    A slot names a kind of request, such as the search box's suggestions. Calls can pass a view token to get a
+    slot of their own per view, so only requests made for the same view supersede each other. A superseded call
+    stops at its next checkpoint, which frees its connections for the call that replaced it, and returns
+    `cancelled_result`.
+    """
+
+    def __init__(self):
+        self._running: dict[str, CancellableTask] = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        # time superseded calls had already spent when they were cancelled
+        self.cancelled_seconds = 0.0
+        self.slots: dict[str, dict] = {}
+
+    def run(self, slot: str, async_fn, *args, view: str = None, cancelled_result=None):
+        """
+        Runs `async_fn(*args)` with `run_call`, cancelling the call currently running in the same slot.
+
+        Arguments:
+            slot: The kind of request.
+            async_fn: The async function to run.
+            view: An optional token scoping the slot, e.g. the tab or view the request was made for.
+            cancelled_result: What to return if this call is superseded before it finishes.
+        """
+        key = f"{slot}:{view}" if view is not None else slot
+        task = CancellableTask()
+        with self._lock:
+            previous = self._running.get(key)
+            self._running[key] = task
+            self.started += 1
+            slot_stats = self.slots.setdefault(slot, {"started": 0, "cancelled": 0, "cancelledSeconds": 0.0})
+            slot_stats["started"] += 1
+        if previous:
+            previous.cancel()
+
+        started_at = time.perf_counter()
+        try:
+            result = run_call(task.run, async_fn, *args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                if self._running.get(key) is task:
+                    del self._running[key]
+
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            if task.cancelled:
+                self.cancelled += 1
+                self.cancelled_seconds += elapsed
+                slot_stats["cancelled"] += 1
+                slot_stats["cancelledSeconds"] += elapsed
+            else:
+                self.completed += 1
+        return cancelled_result if task.cancelled else result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "cancelledSeconds": self.cancelled_seconds,
+                "running": len(self._running),
+                "slots": {slot: dict(slot_stats) for slot, slot_stats in self.slots.items()},
+            }
+
+
+request_slots = RequestSlots()
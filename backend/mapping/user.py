@@ -1,12 +1,71 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+
 import trio
 import api
+from api.utilities.exceptions import NoMoreItems
+from api.utilities.iterators import PageIterator, SortOrder
+from api.utilities.requests import Lane, request_lane
 from .database import get_last_account
-from .games import Games
+from .events import event_bus
+from .fanout import FanOut
+from .joins import index_by, image_index
+from .tasks import run_call
+from .games import Games, ITERATOR_CACHE_SIZE, SEARCH_PAGE_CACHE_SIZE, SEARCH_PAGE_CACHE_MAX_AGE
+
+FOLLOW_PAGE_SIZE = 50
+FOLLOW_LIST_CACHE_SIZE = 10
+FOLLOW_PAGE_CACHE_SIZE = 20
+FOLLOW_PAGE_CACHE_MAX_AGE = 300.0
+PROFILE_BUDGET = 3.0
+# how often a page fetch checks whether its follow list's iterator is free
+FOLLOW_LIST_POLL_INTERVAL = 0.01
+
+
+class FollowList:
+    """
+    The followers or followings of one user. The iterator keeps the cursor of every visited page, so any of them
+    can be fetched again directly, and recently fetched pages are served from its page cache.
+    """
+
+    def __init__(self, iterator: PageIterator):
+        self.iterator = iterator
+        self.total: int = None
+        self._lock = threading.Lock()
+
+    async def get_page_at(self, index: int) -> list:
+        """
+        Returns a page (0-based) of the list. Pages are fetched one at a time, since calls and read-ahead come
+        from event loops on different threads and share the iterator's cursors and page cache.
+        """
+        while not self._lock.acquire(blocking=False):
+            await trio.sleep(FOLLOW_LIST_POLL_INTERVAL)
+        try:
+            return await self.iterator.get_page_at(index)
+        finally:
+            self._lock.release()
+
+
+def presence_detail(presence) -> dict:
+    if not presence:
+        return {"type": "offline", "place": None, "universe": None, "job": None, "lastLocation": None}
+    return {
+        "type": presence.user_presence_type.name,
+        "place": presence.root_place.id if presence.root_place else None,
+        "universe": presence.universe.id if presence.universe else None,
+        "job": presence.job.id if presence.job else None,
+        "lastLocation": presence.last_location
+    }
 
 
 class User:
-    def __init__(self, client: api.Client):
+    def __init__(self, client: api.Client, friends=None):
         self.client = client
+        self.friends = friends
+        self.search_iterators: OrderedDict[tuple[str, int], PageIterator] = OrderedDict()
+        # (user ID, "followers" or "followings") -> list, least recently used first
+        self.follow_lists: OrderedDict[tuple[int, str], FollowList] = OrderedDict()
 
     def get_authed_user(self):
         async def fetch():
@@ -24,41 +83,85 @@ class User:
                 "image": image[0].image_url
             }
 
-        return trio.run(fetch)
+        return run_call(fetch)
 
-    def get_followers_count(self, id: int):
-        async def fetch():
-            try:
-                follower_count = await self.client.users.get_base_user(id).get_follower_count()
-                following_count = await self.client.users.get_base_user(id).get_following_count()
-                friends_count = await self.client.users.get_base_user(id).get_friend_count()
-                return {
-                    "followersCount": follower_count,
-                    "followingCount": following_count,
-                    "friendCount": friends_count
-                }
-            except (KeyError, Exception) as e:
-                print(f"Error fetching follower counts for user {id}: {e}")
-                return {
-                    "followersCount": 0,
-                    "followingCount": 0,
-                    "friendCount": 0
-                }
+    async def _fetch_followers_count(self, id: int):
+        user = self.client.users.get_base_user(id)
+        counts = {}
+
+        async def fetch_count(key: str, get_count):
+            counts[key] = await get_count()
 
-        return trio.run(fetch)
+        try:
+            async with trio.open_nursery() as nursery:
+                nursery.start_soon(fetch_count, "followersCount", user.get_follower_count)
+                nursery.start_soon(fetch_count, "followingCount", user.get_following_count)
+                nursery.start_soon(fetch_count, "friendCount", user.get_friend_count)
+            return counts
+        except (KeyError, Exception) as e:
+            print(f"Error fetching follower counts for user {id}: {e}")
+            return {
+                "followersCount": 0,
+                "followingCount": 0,
+                "friendCount": 0
+            }
+
+    def get_followers_count(self, id: int):
+        return run_call(self._fetch_followers_count, id)
+
+    def _get_search_iterator(self, query: str, page_size: int):
+        key = (query, page_size)
+        iterator = self.search_iterators.get(key)
+        if iterator:
+            self.search_iterators.move_to_end(key)
+            iterator.restart()
+        else:
+            iterator = self.client.users.get_user_search(query, page_size)
+            iterator.page_cache_size = SEARCH_PAGE_CACHE_SIZE
+            iterator.page_cache_max_age = SEARCH_PAGE_CACHE_MAX_AGE
+            self.search_iterators[key] = iterator
+            while len(self.search_iterators) > ITERATOR_CACHE_SIZE:
+                self.search_iterators.popitem(last=False)
+        return iterator
 
     def search_users(self, query: str, page_size: int = 50):
         async def fetch():
             try:
-                iterator = self.client.users.get_user_search(query, page_size)
+                iterator = self._get_search_iterator(query, page_size)
                 users = await iterator.next()
                 return await self._transform_users(users)
             except Exception as e:
                 print(f"Error searching users: {e}")
                 return []
-        return trio.run(fetch)
+        return run_call(fetch)
 
-    async def _transform_users(self, users: list, fetch_friend_status: bool = True):
+    def search_users_page(self, query: str, page: int, page_size: int = 50):
+        """Returns a page (1-based) of a user search, using the recorded cursors for visited pages."""
+        async def fetch():
+            try:
+                key = (query, page_size)
+                iterator = self.search_iterators.get(
+                    key) or self._get_search_iterator(query, page_size)
+                users = await iterator.get_page_at(page - 1)
+                return await self._transform_users(users)
+            except NoMoreItems:
+                return []
+            except Exception as e:
+                print(f"Error searching users: {e}")
+                return []
+        return run_call(fetch)
+
+    async def _transform_users(self, users: list, fetch_friend_status: bool = True, stream: str = None):
+        """
+        Builds user rows with headshots, presences and friend statuses.
+
+        Arguments:
+            users: The users to build rows for.
+            fetch_friend_status: Whether to fetch the friend status of each user with the authenticated user.
+            stream: If set, partial rows with this event name are emitted as the parts arrive: headshots,
+                presences and friend statuses, each as soon as it is fetched. Names are left to the caller,
+                which already has them.
+        """
         results = []
         if not users:
             return results
@@ -86,6 +189,10 @@ class User:
                 )
             except Exception as e:
                 print(f"Error fetching presences: {e}")
+            else:
+                if stream:
+                    event_bus.emit(stream, [
+                        {"id": presence.user.id, "presence": presence_detail(presence)} for presence in presences])
 
         async def fetch_images_headshot():
             try:
@@ -99,6 +206,10 @@ class User:
                 )
             except Exception as e:
                 print(f"Error fetching thumbnails: {e}")
+            else:
+                if stream:
+                    event_bus.emit(stream, [
+                        {"id": user_id, "image": image} for user_id, image in image_index(images_headshot, "").items()])
 
         async def fetch_friend_statuses():
             nonlocal friend_statuses
@@ -111,6 +222,10 @@ class User:
                     )
                 except Exception as e:
                     print(f"Error fetching friend statuses: {e}")
+                else:
+                    if stream:
+                        event_bus.emit(stream, [
+                            {"id": s.user_id, "friendStatus": str(s.status).split('.')[-1]} for s in friend_statuses])
 
         async with trio.open_nursery() as nursery:
             nursery.start_soon(fetch_presences)
@@ -119,6 +234,8 @@ class User:
 
         status_map = {s.user_id: str(s.status).split(
             '.')[-1] for s in friend_statuses} if friend_statuses else {}
+        presence_map = index_by(presences, lambda p: p.user.id)
+        image_map = image_index(images_headshot, "")
 
         for user in users:
             # Handle both object and dict
@@ -133,12 +250,113 @@ class User:
             if not display_name:
                 display_name = str(uid)
 
-            presence = next(
-                (p for p in presences if p.user.id == uid), None)
+            results.append({
+                "id": uid,
+                "name": name,
+                "displayName": display_name,
+                "image": image_map.get(uid, ""),
+                "friendStatus": status_map.get(uid, "NotFriends"),
+                "presence": presence_detail(presence_map.get(uid))
+            })
+        return results
+
+    def get_user_friends(self, user_id: int):
+        async def fetch():
+            account = get_last_account()
+            if self.friends and account and int(account.get("id")) == user_id:
+                # the authenticated user's list is kept up to date by the friends store
+                friends_raw = await self.friends()._get_store(user_id).get_friends()
+            else:
+                friends_raw = await self.client.users.get_base_user(user_id).get_friendsv2()
+            return await self._transform_users(friends_raw)
+        return run_call(fetch)
+
+    def _get_follow_list(self, user_id: int, channel: str) -> FollowList:
+        key = (user_id, channel)
+        follow_list = self.follow_lists.get(key)
+        if follow_list:
+            self.follow_lists.move_to_end(key)
+            return follow_list
+
+        base_user = self.client.users.get_base_user(user_id)
+        iterator = base_user.get_followers if channel == "followers" else base_user.get_followings
+        follow_list = FollowList(iterator(page_size=FOLLOW_PAGE_SIZE, sort_order=SortOrder.Descending))
+        follow_list.iterator.read_ahead = 1
+        follow_list.iterator.page_cache_size = FOLLOW_PAGE_CACHE_SIZE
+        follow_list.iterator.page_cache_max_age = FOLLOW_PAGE_CACHE_MAX_AGE
+        self.follow_lists[key] = follow_list
+        while len(self.follow_lists) > FOLLOW_LIST_CACHE_SIZE:
+            self.follow_lists.popitem(last=False)
+        return follow_list
+
+    async def _fetch_follow_page(self, user_id: int, channel: str, page: int):
+        """
+        Returns a page (1-based) of a user's followers or followings.
+
+        The page's names are emitted as a `followPage` event as soon as they are known, and headshots, presences
+        and friend statuses follow as `followUsersUpdate` events while they arrive. The page after it is fetched
+        into the iterator's page cache in the background, so paging forward doesn't wait on the network.
+        """
+        follow_list = self._get_follow_list(user_id, channel)
+        iterator = follow_list.iterator
+
+        async def fetch_total():
+            try:
+                follow_list.total = await self.client.users.get_base_user(user_id)._get_friend_channel_count(channel)
+            except Exception as e:
+                print(f"Error fetching {channel} count for user {user_id}: {e}")
+
+        async with trio.open_nursery() as nursery:
+            if follow_list.total is None:
+                nursery.start_soon(fetch_total)
+            try:
+                data = await follow_list.get_page_at(page - 1)
+            except NoMoreItems:
+                data = []
+
+        # the channel only returns IDs, names come from one batched lookup
+        users = await self.client.users.get_users([user.id for user in data]) if data else []
+        has_more = page < len(iterator.page_cursors) and iterator.page_cursors[page] is not None
+        event_bus.emit("followPage", {
+            "userId": user_id,
+            "channel": channel,
+            "page": page,
+            "total": follow_list.total,
+            "hasMore": has_more,
+            "users": [{"id": user.id, "name": user.name, "displayName": user.display_name} for user in users],
+        })
+
+        if has_more and iterator.read_ahead:
+            self._read_ahead(follow_list, user_id, channel, page)
+        return await self._transform_users(users, stream="followUsersUpdate")
+
+    def _read_ahead(self, follow_list: FollowList, user_id: int, channel: str, page: int):
+        async def read_ahead():
+            for index in range(page, page + follow_list.iterator.read_ahead):
+                await follow_list.get_page_at(index)
+
+        def prefetch():
+            try:
+                with request_lane(Lane.prefetch):
+                    trio.run(read_ahead)
+            except NoMoreItems:
+                pass
+            except Exception as e:
+                print(f"Error prefetching {channel} page for user {user_id}: {e}", flush=True)
+
+        threading.Thread(target=prefetch, daemon=True).start()
+
+    def get_user_followers(self, user_id: int, page: int = 1):
+        return run_call(self._fetch_follow_page, user_id, "followers", page)
+
+    def get_user_following(self, user_id: int, page: int = 1):
+        return run_call(self._fetch_follow_page, user_id, "followings", page)
 
-            image = next(
-                (i.image_url for i in images_headshot if i.target_id == uid), "")
+    async def _fetch_users_presence(self, user_ids: list):
+        presences = await self.client.presence.get_user_presences(user_ids)
+        results = []
 
+        for presence in presences:
             presence_type = "offline"
             root_place_id = None
             universe_id = None
@@ -154,11 +372,7 @@ class User:
                 last_location = presence.last_location
 
             results.append({
-                "id": uid,
-                "name": name,
-                "displayName": display_name,
-                "image": image,
-                "friendStatus": status_map.get(uid, "NotFriends"),
+                "id": presence.user.id,
                 "presence": {
                     "type": presence_type,
                     "place": root_place_id,
@@ -169,253 +383,237 @@ class User:
             })
         return results
 
-    def get_user_friends(self, user_id: int):
-        async def fetch():
-            friends_raw = await self.client.users.get_base_user(user_id).get_friendsv2()
-            return await self._transform_users(friends_raw)
-        return trio.run(fetch)
-
-    def get_user_followers(self, user_id: int):
-        async def fetch():
-            # Manually fetch since BaseUser iterator loses name data
-            url = self.client.url_generator.get_url(
-                "friends", f"v1/users/{user_id}/followers")
-            response = await self.client.requests.get(url, params={"limit": 50, "sortOrder": "Desc"})
-            data = response.json().get("data", [])
-            users = await self.client.users.get_users([user["id"] for user in data])
-            return await self._transform_users(users)
-        return trio.run(fetch)
-
-    def get_user_following(self, user_id: int):
-        async def fetch():
-            # Manually fetch since BaseUser iterator loses name data
-            url = self.client.url_generator.get_url(
-                "friends", f"v1/users/{user_id}/followings")
-            response = await self.client.requests.get(url, params={"limit": 50, "sortOrder": "Desc"})
-            data = response.json().get("data", [])
-            users = await self.client.users.get_users([user["id"] for user in data])
-            return await self._transform_users(users)
-        return trio.run(fetch)
-
     def get_users_presence(self, user_ids: list):
-        async def fetch():
-            presences = await self.client.presence.get_user_presences(user_ids)
-            results = []
-
-            for presence in presences:
-                presence_type = "offline"
-                root_place_id = None
-                universe_id = None
-                job_id = None
-                last_location = None
-
-                if presence:
-                    presence_type = presence.user_presence_type.name
-                    place_id = presence.place.id if presence.place else None
-                    root_place_id = presence.root_place.id if presence.root_place else None
-                    universe_id = presence.universe.id if presence.universe else None
-                    job_id = presence.job.id if presence.job else None
-                    last_location = presence.last_location
-
-                results.append({
-                    "id": presence.user.id,
-                    "presence": {
-                        "type": presence_type,
-                        "place": root_place_id,
-                        "universe": universe_id,
-                        "job": job_id,
-                        "lastLocation": last_location
-                    }
-                })
-            return results
+        return run_call(self._fetch_users_presence, user_ids)
 
-        return trio.run(fetch)
+    async def _fetch_user_info(self, user_id: int = None):
+        current_user_id = int(get_last_account().get("id"))
+        target_id = user_id if user_id else current_user_id
 
-    def get_user_info(self, user_id: int = None):
-        async def fetch():
-            current_user_id = int(get_last_account().get("id"))
-            target_id = user_id if user_id else current_user_id
+        base = await self.client.users.get_user(target_id)
 
-            base = await self.client.users.get_user(target_id)
+        image = await self.client.thumbnails.get_user_avatar_thumbnails(
+            [target_id], api.AvatarThumbnailType.headshot, (420, 420)
+        )
 
-            image = await self.client.thumbnails.get_user_avatar_thumbnails(
-                [target_id], api.AvatarThumbnailType.headshot, (420, 420)
-            )
+        # Fetch presence and friend status
+        presence = None
+        friend_status = "NotFriends"
 
-            # Fetch presence and friend status
-            presence = None
-            friend_status = "NotFriends"
+        presences = await self.client.presence.get_user_presences([target_id])
+        if presences:
+            presence = presences[0]
 
-            presences = await self.client.presence.get_user_presences([target_id])
-            if presences:
-                presence = presences[0]
+        if target_id != current_user_id:
+            try:
+                statuses = await self.client.users.get_friend_status(current_user_id, [target_id])
+                if statuses:
+                    friend_status = str(statuses[0].status).split('.')[-1]
+            except:
+                pass
+        else:
+            friend_status = "Self"
+
+        presence_dict = None
+        if presence:
+            presence_dict = {
+                "type": presence.user_presence_type.name,
+                "place": presence.place.id if presence.place else None,
+                "universe": presence.universe.id if presence.universe else None,
+                "job": presence.job.id if presence.job else None,
+                "lastLocation": presence.last_location
+            }
 
-            if target_id != current_user_id:
-                try:
-                    statuses = await self.client.users.get_friend_status(current_user_id, [target_id])
-                    if statuses:
-                        friend_status = str(statuses[0].status).split('.')[-1]
-                except:
-                    pass
-            else:
-                friend_status = "Self"
+        return {
+            "id": base.id,
+            "name": base.name,
+            "displayName": base.display_name,
+            "image": image[0].image_url,
+            "presence": presence_dict,
+            "friendStatus": friend_status
+        }
 
-            presence_dict = None
-            if presence:
-                presence_dict = {
-                    "type": presence.user_presence_type.name,
-                    "place": presence.place.id if presence.place else None,
-                    "universe": presence.universe.id if presence.universe else None,
-                    "job": presence.job.id if presence.job else None,
-                    "lastLocation": presence.last_location
-                }
+    def get_user_info(self, user_id: int = None):
+        return run_call(self._fetch_user_info, user_id)
 
-            return {
-                "id": base.id,
-                "name": base.name,
-                "displayName": base.display_name,
-                "image": image[0].image_url,
-                "presence": presence_dict,
-                "friendStatus": friend_status
-            }
-        return trio.run(fetch)
+    async def _fetch_user_groups(self, user_id: int = None):
+        id = user_id if user_id else get_last_account().get("id")
+        user = self.client.users.get_base_user(id)
+        roles = await user.get_group_roles()
+        groups = []
 
-    def get_user_groups(self, user_id: int = None):
-        async def fetch():
-            id = user_id if user_id else get_last_account().get("id")
-            user = self.client.users.get_base_user(id)
-            roles = await user.get_group_roles()
-            groups = []
+        group_ids = list(set([role.group.id for role in roles]))
 
-            group_ids = list(set([role.group.id for role in roles]))
+        thumbnails = []
+        if group_ids:
+            thumbnails = await self.client.thumbnails.get_group_icons(
+                group_ids, (150, 150)
+            )
 
-            thumbnails = []
-            if group_ids:
-                thumbnails = await self.client.thumbnails.get_group_icons(
-                    group_ids, (150, 150)
-                )
+        icons = image_index(thumbnails)
+        for role in roles:
+            image = icons.get(role.group.id)
+            groups.append({
+                "id": role.group.id,
+                "name": role.group.name,
+                "memberCount": role.group.member_count,
+                "rank": role.rank,
+                "role": role.name,
+                "image": image
+            })
+        return groups
 
-            for role in roles:
-                image = next(
-                    (t.image_url for t in thumbnails if t.target_id == role.group.id), None)
-                groups.append({
-                    "id": role.group.id,
-                    "name": role.group.name,
-                    "memberCount": role.group.member_count,
-                    "rank": role.rank,
-                    "role": role.name,
-                    "image": image
-                })
-            return groups
-
-        return trio.run(fetch)
+    def get_user_groups(self, user_id: int = None):
+        return run_call(self._fetch_user_groups, user_id)
+
+    async def _fetch_user_badges(self, user_id: int = None):
+        id = user_id if user_id else get_last_account().get("id")
+        user = self.client.users.get_base_user(id)
+        badges = await user.get_roblox_badges()
+        return [{
+            "id": badge.id,
+            "name": badge.name,
+            "description": badge.description,
+            "imageUrl": badge.image_url
+        } for badge in badges]
 
     def get_user_badges(self, user_id: int = None):
-        async def fetch():
-            id = user_id if user_id else get_last_account().get("id")
-            user = self.client.users.get_base_user(id)
-            badges = await user.get_roblox_badges()
-            return [{
-                "id": badge.id,
-                "name": badge.name,
-                "description": badge.description,
-                "imageUrl": badge.image_url
-            } for badge in badges]
-
-        return trio.run(fetch)
+        return run_call(self._fetch_user_badges, user_id)
+
+    async def _fetch_user_social_links(self, user_id: int = None):
+        id = user_id if user_id else get_last_account().get("id")
+        user = self.client.users.get_base_user(id)
+        try:
+            channels = await user.get_promotion_channels()
+            return {
+                "facebook": channels.facebook,
+                "twitter": channels.twitter,
+                "youtube": channels.youtube,
+                "twitch": channels.twitch,
+                "guilded": channels.guilded
+            }
+        except:
+            return {}
 
     def get_user_social_links(self, user_id: int = None):
-        async def fetch():
-            id = user_id if user_id else get_last_account().get("id")
-            user = self.client.users.get_base_user(id)
-            try:
-                channels = await user.get_promotion_channels()
-                return {
-                    "facebook": channels.facebook,
-                    "twitter": channels.twitter,
-                    "youtube": channels.youtube,
-                    "twitch": channels.twitch,
-                    "guilded": channels.guilded
-                }
-            except:
-                return {}
+        return run_call(self._fetch_user_social_links, user_id)
+
+    async def _fetch_user_creations(self, user_id: int = None):
+        id = user_id if user_id else get_last_account().get("id")
+        response = await self.client.requests.cache_get(
+            url=self.client.url_generator.get_url(
+                "games", f"v2/users/{id}/games"),
+            params={"accessFilter": 2, "limit": 50, "sortOrder": "Asc"}
+        )
+        data = response.json().get("data", [])
+        game_ids = [g.get("id") for g in data]
+
+        if not game_ids:
+            return []
 
-        return trio.run(fetch)
+        universes = await self.client.universes.get_universes(game_ids)
+        games_mapping = Games(self.client)
+        items = await games_mapping._get_page_items(universes)
+        del games_mapping
+        return items
 
     def get_user_creations(self, user_id: int = None):
-        async def fetch():
-            id = user_id if user_id else get_last_account().get("id")
-            response = await self.client.requests.cache_get(
-                url=self.client.url_generator.get_url(
-                    "games", f"v2/users/{id}/games"),
-                params={"accessFilter": 2, "limit": 50, "sortOrder": "Asc"}
-            )
-            data = response.json().get("data", [])
-            game_ids = [g.get("id") for g in data]
+        return run_call(self._fetch_user_creations, user_id)
+
+    async def _fetch_user_favorites(self, user_id: int = None):
+        id = user_id if user_id else get_last_account().get("id")
+        # Using v2 endpoint for user favorites
+        response = await self.client.requests.cache_get(
+            url=self.client.url_generator.get_url(
+                "games", f"v2/users/{id}/favorite/games"),
+            params={"accessFilter": 2, "limit": 50}
+        )
+        data = response.json().get("data", [])
+        game_ids = [g.get("id") for g in data]
+
+        if not game_ids:
+            return []
 
-            if not game_ids:
-                return []
+        universes = await self.client.universes.get_universes(game_ids)
+        games_mapping = Games(self.client)
+        items = await games_mapping._get_page_items(universes)
+        del games_mapping
+        return items
 
-            universes = await self.client.universes.get_universes(game_ids)
-            games_mapping = Games(self.client)
-            items = await games_mapping._get_page_items(universes)
-            del games_mapping
-            return items
+    def get_user_favorites(self, user_id: int = None):
+        return run_call(self._fetch_user_favorites, user_id)
 
-        return trio.run(fetch)
+    async def _fetch_user_3d_avatar(self, user_id: int):
+        try:
+            thumbnail = await self.client.thumbnails.get_user_avatar_thumbnail_3d(user_id)
 
-    def get_user_favorites(self, user_id: int = None):
-        async def fetch():
-            id = user_id if user_id else get_last_account().get("id")
-            # Using v2 endpoint for user favorites
             response = await self.client.requests.cache_get(
                 url=self.client.url_generator.get_url(
-                    "games", f"v2/users/{id}/favorite/games"),
-                params={"accessFilter": 2, "limit": 50}
+                    "avatar", f"v2/avatar/users/{user_id}/avatar"),
             )
-            data = response.json().get("data", [])
-            game_ids = [g.get("id") for g in data]
+            render = response.json()
 
-            if not game_ids:
-                return []
+            data = await thumbnail.get_3d_data()
+            return {
+                "obj": data.obj.get_url(),
+                "mtl": data.mtl.get_url(),
+                "textures": [t.get_url() for t in data.textures],
+                "camera": {
+                    "position": {"x": data.camera.position.x, "y": data.camera.position.y, "z": data.camera.position.z},
+                    "direction": {"x": data.camera.direction.x, "y": data.camera.direction.y, "z": data.camera.direction.z},
+                    "fov": data.camera.fov
+                },
+                "aabb": {
+                    "min": {"x": data.aabb.min.x, "y": data.aabb.min.y, "z": data.aabb.min.z},
+                    "max": {"x": data.aabb.max.x, "y": data.aabb.max.y, "z": data.aabb.max.z}
+                },
+                "bodyColors": render.get("bodyColor3s", {})
+            }
+        except Exception as e:
+            print(f"Error fetching 3D avatar for user {user_id}: {e}")
+            return None
 
-            universes = await self.client.universes.get_universes(game_ids)
-            games_mapping = Games(self.client)
-            items = await games_mapping._get_page_items(universes)
-            del games_mapping
-            return items
+    def get_user_3d_avatar(self, user_id: int):
+        return run_call(self._fetch_user_3d_avatar, user_id)
 
-        return trio.run(fetch)
+    def get_profile_bundle(self, user_id: int = None, budget: float = PROFILE_BUDGET):
+        """
+        Fetches every section of a profile concurrently under one deadline.
 
-    def get_user_3d_avatar(self, user_id: int):
+        Each section is emitted as a `profileSection` event as soon as it completes, so the profile renders
+        progressively. A section that fails or isn't done when the budget runs out is listed under `missing`
+        instead of failing the others; if it finishes later it still arrives as a `profileSection` event.
+
+        Arguments:
+            user_id: The user whose profile to fetch, the authenticated user by default.
+            budget: How many seconds all sections may take together.
+        """
         async def fetch():
-            try:
-                thumbnail = await self.client.thumbnails.get_user_avatar_thumbnail_3d(user_id)
+            target_id = user_id if user_id else int(get_last_account().get("id"))
+            sections = {
+                "info": self._fetch_user_info,
+                "counts": self._fetch_followers_count,
+                "groups": self._fetch_user_groups,
+                "badges": self._fetch_user_badges,
+                "socialLinks": self._fetch_user_social_links,
+                "creations": self._fetch_user_creations,
+                "favorites": self._fetch_user_favorites,
+                "avatar3d": self._fetch_user_3d_avatar,
+            }
 
-                response = await self.client.requests.cache_get(
-                    url=self.client.url_generator.get_url(
-                        "avatar", f"v2/avatar/users/{user_id}/avatar"),
-                )
-                render = response.json()
-
-                data = await thumbnail.get_3d_data()
-                return {
-                    "obj": data.obj.get_url(),
-                    "mtl": data.mtl.get_url(),
-                    "textures": [t.get_url() for t in data.textures],
-                    "camera": {
-                        "position": {"x": data.camera.position.x, "y": data.camera.position.y, "z": data.camera.position.z},
-                        "direction": {"x": data.camera.direction.x, "y": data.camera.direction.y, "z": data.camera.direction.z},
-                        "fov": data.camera.fov
-                    },
-                    "aabb": {
-                        "min": {"x": data.aabb.min.x, "y": data.aabb.min.y, "z": data.aabb.min.z},
-                        "max": {"x": data.aabb.max.x, "y": data.aabb.max.y, "z": data.aabb.max.z}
-                    },
-                    "bodyColors": render.get("bodyColor3s", {})
-                }
-            except Exception as e:
-                print(f"Error fetching 3D avatar for user {user_id}: {e}")
-                return None
+            def emit_section(name: str, data, late: bool):
+                event_bus.emit("profileSection", {"userId": target_id, "section": name, "data": data, "late": late})
+
+            fan_out = FanOut(
+                {name: partial(fetch_function, target_id) for name, fetch_function in sections.items()},
+                budget,
+                on_result=emit_section
+            )
+            results, missing = await fan_out.run()
+            return {
+                "userId": target_id,
+                "sections": results,
+                "missing": missing,
+            }
 
-        return trio.run(fetch)
+        return run_call(fetch)
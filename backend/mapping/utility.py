@@ -7,9 +7,10 @@ import os
 import psutil
 from typing import Literal
 
-import trio
 import api
 import mapping.auth
+from mapping.servers import pick_best_server
+from mapping.tasks import run_call
 import webview
 import winshell
 from pathlib import Path
@@ -127,6 +128,20 @@ class Utility:
             private_id=private_id
         )
 
+    def join_best_server(self, place_id: int, strategy: str = "balanced", deadline: float = 3.0):
+        """
+        Picks the best server of a place for the given strategy within `deadline` seconds and launches into it.
+        Falls back to regular matchmaking when no joinable server was sampled in time.
+        """
+        result = run_call(pick_best_server, self.client,
+                          place_id, strategy, deadline)
+        if result["server"]:
+            result["launched"] = self.launch_roblox(
+                "Play", place_id=place_id, job_id=result["server"]["id"])
+        else:
+            result["launched"] = self.launch_roblox("Play", place_id=place_id)
+        return result
+
     def create_shortcut(self, game_name: str, place_id: int, account_name: str, account_id: int, image_url: str):
         print(
             f"Creating shortcut for account ID {account_id} with place ID {place_id}...,{image_url}")
@@ -164,4 +179,4 @@ class Utility:
 
             return True
 
-        return trio.run(create)
+        return run_call(create)
@@ -0,0 +1,49 @@
+import threading
+
+import trio
+
+from mapping.fanout import FanOut
+
+
+def test_slow_child_keeps_running_past_the_budget():
+    calls = []
+    reported = []
+    late_result = threading.Event()
+
+    async def slow():
+        calls.append("slow")
+        await trio.sleep(0.2)
+        return "slow"
+
+    async def fast():
+        return "fast"
+
+    def on_result(name: str, result, late: bool):
+        reported.append((name, result, late))
+        if late:
+            late_result.set()
+
+    fan_out = FanOut({"slow": slow, "fast": fast}, 0.05, on_result=on_result)
+    results, missing = trio.run(fan_out.run)
+
+    assert results == {"fast": "fast"}
+    assert missing == ["slow"]
+    assert late_result.wait(2)
+    assert calls == ["slow"]
+    assert ("slow", "slow", True) in reported
+    assert fan_out.stats()["late"] == 1
+
+
+def test_cancel_stops_late_children():
+    reported = []
+
+    async def slow():
+        await trio.sleep(0.2)
+
+    fan_out = FanOut({"slow": slow}, 0.01, on_result=lambda *result: reported.append(result))
+    trio.run(fan_out.run)
+    fan_out.cancel()
+
+    trio.run(trio.sleep, 0.3)
+    assert reported == []
+    assert not fan_out.stats()["running"]
@@ -0,0 +1,48 @@
+import time
+
+import api
+import mapping.friends as friends_module
+from mapping.friends import Friends
+
+ACCOUNT_ID = 1
+REQUESTER_ID = 2
+
+
+class Response:
+    status_code = 200
+
+
+def make_friends(monkeypatch) -> Friends:
+    async def post(*args, **kwargs):
+        return Response()
+
+    client = api.Client(enable_websocket=False)
+    monkeypatch.setattr(client.requests, "post", post)
+    monkeypatch.setattr(friends_module, "get_last_account", lambda: {"id": ACCOUNT_ID})
+    friends = Friends(client)
+    store = friends._get_store(ACCOUNT_ID)
+    store.loaded_at = time.monotonic()
+    store.incoming_requests.add(REQUESTER_ID)
+    return friends
+
+
+def test_decline_friend_request_updates_store(monkeypatch):
+    friends = make_friends(monkeypatch)
+    store = friends._get_store(ACCOUNT_ID)
+
+    assert friends.decline_friend_request(REQUESTER_ID) is True
+    assert REQUESTER_ID not in store.incoming_requests
+    assert store.patches == 1
+    assert friends.get_incoming_friend_requests() == []
+
+
+def test_declined_notification_updates_store(monkeypatch):
+    friends = make_friends(monkeypatch)
+    store = friends._get_store(ACCOUNT_ID)
+
+    friends._handle_friendship_notifications({
+        "Type": "FriendshipDeclined",
+        "EventArgs": {"UserId1": ACCOUNT_ID, "UserId2": REQUESTER_ID},
+    })
+    assert REQUESTER_ID not in store.incoming_requests
+    assert store.patches == 1
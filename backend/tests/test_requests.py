@@ -0,0 +1,43 @@
+import threading
+
+import trio
+
+from api.utilities.requests import Requests
+
+
+def test_each_event_loop_gets_its_own_session():
+    requests = Requests()
+    requests.session.cookies[".ROBLOSECURITY"] = "token"
+    sessions = {}
+
+    async def use_session(name: str):
+        session = requests._session_for_context()
+        assert requests._session_for_context() is session
+        sessions[name] = session
+        await trio.sleep(0.01)
+
+    threads = [threading.Thread(target=trio.run, args=(use_session, name)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sessions["a"] is not sessions["b"]
+    assert requests.session not in sessions.values()
+    assert sessions["a"].cookies.get(".ROBLOSECURITY") == "token"
+
+    # the base session's cookie jar and headers are shared with every loop's session
+    requests.session.cookies[".ROBLOSECURITY"] = "switched"
+    assert sessions["b"].cookies.get(".ROBLOSECURITY") == "switched"
+
+
+def test_loop_session_picks_up_base_headers():
+    requests = Requests()
+
+    async def main():
+        session = requests._session_for_context()
+        requests.session.headers["X-CSRF-Token"] = "abc"
+        assert requests._session_for_context() is session
+        assert session.headers["X-CSRF-Token"] == "abc"
+
+    trio.run(main)
@@ -0,0 +1,24 @@
+import trio
+
+from mapping.tasks import CancellableTask
+
+
+def test_cancel_from_the_same_event_loop():
+    task = CancellableTask()
+
+    async def main():
+        with trio.fail_after(2):
+            async with trio.open_nursery() as nursery:
+                nursery.start_soon(task.run, trio.sleep, 5)
+                await trio.sleep(0.01)
+                task.cancel()
+
+    trio.run(main)
+    assert task.cancelled
+
+
+def test_cancel_after_finishing_is_ignored():
+    task = CancellableTask()
+    trio.run(task.run, trio.sleep, 0)
+    task.cancel()
+    assert not task.cancelled